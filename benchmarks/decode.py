@@ -0,0 +1,95 @@
+# MQTT payload decoding benchmark: stdlib dicts vs the fast decoder vs lean records.
+#
+# For each high-rate topic reports decode throughput (messages/sec) and the memory one
+# decoded message keeps alive once buffered (bytes/record, via tracemalloc):
+#
+#     python -m benchmarks.decode
+#     python -m benchmarks.decode --messages 200000 --json decode.json
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from src.records import DECODER, RECORD_DECODER, RECORD_FIELDS, decode_message, loads
+
+START = datetime(2025, 7, 6, 14, 0, tzinfo=timezone.utc)
+
+
+def sample_payloads(topic, n, seed=1):
+    # Raw MQTT bodies shaped like OpenF1's, including the fields lean records drop
+    rng = random.Random(seed)
+    payloads = []
+    for i in range(n):
+        message = {"meeting_key": 1262, "session_key": 9999, "driver_number": rng.choice([1, 4, 16, 44, 63, 81]),
+                   "date": (START + timedelta(milliseconds=270 * i + rng.randint(0, 9))).isoformat()}
+        if topic == "v1/car_data":
+            message.update(speed=rng.randint(80, 330), rpm=rng.randint(9000, 12000), n_gear=rng.randint(2, 8),
+                           throttle=rng.randint(0, 100), brake=rng.choice([0, 100]), drs=rng.choice([0, 8, 12]))
+        elif topic == "v1/location":
+            message.update(x=rng.randint(-9000, 9000), y=rng.randint(-9000, 9000), z=rng.randint(0, 200))
+        elif topic == "v1/position":
+            message.update(position=rng.randint(1, 20))
+        elif topic == "v1/intervals":
+            message.update(gap_to_leader=round(rng.random() * 30, 3), interval=round(rng.random() * 3, 3))
+        payloads.append(json.dumps(message).encode())
+    return payloads
+
+
+DECODERS = {
+    "json dict": lambda topic, raw: json.loads(raw.decode()),
+    f"{DECODER} dict": lambda topic, raw: loads(raw),
+    f"{RECORD_DECODER} record": lambda topic, raw: decode_message(topic, raw, lean=True),
+}
+
+
+def throughput(decode, topic, payloads, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for raw in payloads:
+            decode(topic, raw)
+        best = min(best, time.perf_counter() - t0)
+    return len(payloads) / best
+
+
+def bytes_per_record(decode, topic, payloads):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [decode(topic, raw) for raw in payloads]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    size = (after - before) / len(kept)
+    del kept
+    return size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark MQTT payload decoding")
+    parser.add_argument("--messages", type=int, default=50000, help="messages per topic")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args(argv)
+
+    results = {"decoder": DECODER, "record_decoder": RECORD_DECODER, "topics": {}}
+    print(f"{'topic':<14}{'decoder':<18}{'msg/s':>12}{'bytes/record':>14}")
+    for topic in RECORD_FIELDS:
+        payloads = sample_payloads(topic, args.messages)
+        results["topics"][topic] = {}
+        for name, decode in DECODERS.items():
+            rate = throughput(decode, topic, payloads, args.repeats)
+            size = bytes_per_record(decode, topic, payloads)
+            results["topics"][topic][name] = {"rate_per_s": rate, "bytes_per_record": size}
+            print(f"{topic[3:]:<14}{name:<18}{rate:>12,.0f}{size:>14,.0f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+# Live hot path benchmark: replay a recorded (or synthetic) MQTT session through
+# OpenF1Client.on_message -> InsightsEngine -> UI row building and report
+#
+# - ingest rate (messages/sec fed through on_message at max speed),
+# - end-to-end latency (message arrival -> insights -> rows ready for the tables),
+# - memory growth across repeated replays (the live buffers are bounded, so it should stay flat).
+#
+# Runs on a plain Linux box with no broker, credentials or display:
+#
+#     python -m benchmarks.live_path                      # synthetic 20-car session at 10x
+#     python -m benchmarks.live_path session.log.gz --speed 10 --json results.json
+#     python -m benchmarks.live_path --min-rate 20000 --max-p95-ms 50 --max-growth-mb 5   # CI gate
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.api_client import OpenF1Client
+from src.insights_engine import InsightsEngine
+from src.downsample import downsample_frame
+from src.session_replay import SessionRecorder, SessionReplayer, parse_speed
+
+UI_TICK = 0.5  # seconds, same as the app's live_refresh_interval
+CHART_POINTS = 1000
+
+
+def synthetic_session(path, drivers=20, seconds=300, seed=1):
+    # Message mix of a race: car_data/location ~4 Hz per car, timing every few seconds,
+    # laps every ~90 s, occasional race control. Offsets are written directly.
+    rng = random.Random(seed)
+    start = datetime(2025, 7, 6, 14, 0, tzinfo=timezone.utc)
+    numbers = [1, 4, 10, 11, 14, 16, 18, 22, 23, 24, 27, 31, 44, 55, 63, 77, 81, 2, 20, 3][:drivers]
+    events = []
+    for i, num in enumerate(numbers):
+        phase = i / drivers
+        for k in range(int(seconds * 3.7)):
+            t = k / 3.7 + rng.random() * 0.05
+            angle = 2 * np.pi * (t / 90 + phase)
+            events.append((t, "v1/car_data", {"driver_number": num, "speed": rng.randint(80, 330), "rpm": rng.randint(9000, 12000),
+                                              "n_gear": rng.randint(2, 8), "throttle": rng.randint(0, 100), "brake": 0, "drs": 0}))
+            events.append((t + 0.1, "v1/location", {"driver_number": num, "x": 5000 * np.cos(angle), "y": 3000 * np.sin(angle), "z": 0}))
+        for k in range(int(seconds / 4)):
+            t = k * 4 + rng.random()
+            events.append((t, "v1/intervals", {"driver_number": num, "gap_to_leader": round(i * 1.3 + rng.random(), 3), "interval": round(rng.random() * 2, 3)}))
+            events.append((t, "v1/position", {"driver_number": num, "position": i + 1}))
+        for lap in range(1, int(seconds / 90) + 2):
+            t = lap * 90 - 90 * phase
+            if 0 <= t < seconds:
+                events.append((t, "v1/laps", {"driver_number": num, "lap_number": lap, "lap_duration": 89 + rng.random() * 3,
+                                              "duration_sector_1": 29.1, "duration_sector_2": 30.2, "duration_sector_3": 30.5}))
+        events.append((0.0, "v1/stints", {"driver_number": num, "stint_number": 1, "compound": "MEDIUM", "lap_start": 1}))
+    for k in range(int(seconds / 60)):
+        events.append((k * 60.0, "v1/weather", {"air_temperature": 25.0, "track_temperature": 40.0, "rainfall": 0}))
+        events.append((k * 60.0 + 5, "v1/race_control", {"category": "Flag", "message": "GREEN LIGHT - PIT EXIT OPEN"}))
+    events.sort(key=lambda e: e[0])
+
+    with SessionRecorder(path) as recorder:
+        for t, topic, payload in events:
+            payload["date"] = (start + timedelta(seconds=t)).isoformat()
+            payload.setdefault("session_key", 9999)
+            recorder.record(topic, json.dumps(payload, separators=(",", ":")).encode(), offset=t)
+    return len(events)
+
+
+def new_pipeline():
+    client = OpenF1Client(cache=False)
+    engine = InsightsEngine(incremental=True)
+    client.message_handlers.append(engine.apply_message)
+    return client, engine
+
+
+def render_rows(engine, insights):
+    # What a refresh of the busiest tabs does after generate_insights, minus toga itself
+    rows = []
+    standings = insights.get("standings")
+    if standings is not None:
+        rows.extend(zip(standings["driver_number"].map(engine.drivers), standings["gap_to_leader"].astype(str), standings["interval"].astype(str)))
+    laps = insights.get("laps")
+    if laps is not None and not laps.empty:
+        rows.extend(laps[["driver_number", "lap_number", "lap_duration"]].itertuples(index=False))
+    telemetry = insights.get("telemetry")
+    if telemetry is not None and not telemetry.empty:
+        rows.append(downsample_frame(telemetry, "date", ["speed"], CHART_POINTS, by="driver_number"))
+    return rows
+
+
+def bench_ingest(replayer, repeats):
+    # Max-speed feed; best of `repeats` to reduce scheduler noise
+    rates = []
+    for _ in range(repeats):
+        client, engine = new_pipeline()
+        t0 = time.perf_counter()
+        count = replayer.feed(client, speed=None)
+        rates.append(count / (time.perf_counter() - t0))
+    return {"messages": count, "rate_per_s": max(rates)}
+
+
+def bench_latency(replayer, speed):
+    # Replayer thread feeds on_message; the main thread runs the UI tick. Latency of a
+    # message = time its tick finished rendering - time it arrived.
+    client, engine = new_pipeline()
+    arrivals = deque()
+    client.message_handlers.append(lambda topic, payload: arrivals.append(time.perf_counter()))
+    done = threading.Event()
+    feeder = threading.Thread(target=lambda: (replayer.feed(client, speed=speed), done.set()), daemon=True)
+    latencies, tick_costs = [], []
+    feeder.start()
+    while True:
+        finished = done.is_set()
+        tick_start = time.perf_counter()
+        pending = len(arrivals)
+        insights = engine.generate_insights(None, mode="live")
+        render_rows(engine, insights)
+        now = time.perf_counter()
+        tick_costs.append(now - tick_start)
+        latencies.extend(now - arrivals.popleft() for _ in range(pending))
+        if finished and not arrivals:
+            break
+        time.sleep(max(0.0, UI_TICK / max(speed or 1.0, 1.0) - (time.perf_counter() - tick_start)))
+    feeder.join()
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "speed": speed or "max",
+        "messages": len(latencies),
+        "p50_ms": float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else None,
+        "p95_ms": float(np.percentile(latencies_ms, 95)) if len(latencies_ms) else None,
+        "max_ms": float(latencies_ms.max()) if len(latencies_ms) else None,
+        "tick_ms": float(np.mean(tick_costs) * 1000),
+    }
+
+
+def bench_memory(replayer, passes):
+    # Growth after the buffers fill: pass 1 warms up, later passes should add ~nothing
+    client, engine = new_pipeline()
+    tracemalloc.start()
+    sizes = []
+    for _ in range(passes):
+        replayer.feed(client, speed=None)
+        engine.generate_insights(None, mode="live")
+        gc.collect()
+        sizes.append(tracemalloc.get_traced_memory()[0])
+    tracemalloc.stop()
+    mb = [s / 1e6 for s in sizes]
+    return {"passes": passes, "after_first_mb": mb[0], "after_last_mb": mb[-1], "growth_mb": mb[-1] - mb[0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the live ingest -> insights -> UI path")
+    parser.add_argument("log", nargs="?", help="recorded session log (default: synthetic session)")
+    parser.add_argument("--drivers", type=int, default=20)
+    parser.add_argument("--seconds", type=int, default=120, help="synthetic session length")
+    parser.add_argument("--speed", type=parse_speed, default=10.0, help="latency replay speed: 1, 10 or max")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--min-rate", type=float, help="fail if ingest is slower (messages/sec)")
+    parser.add_argument("--max-p95-ms", type=float, help="fail if p95 end-to-end latency is higher")
+    parser.add_argument("--max-growth-mb", type=float, help="fail if memory grows more across replays")
+    args = parser.parse_args(argv)
+
+    tmp = None
+    path = args.log
+    if path is None:
+        tmp = tempfile.NamedTemporaryFile(suffix=".log.gz", delete=False)
+        tmp.close()
+        path = tmp.name
+        synthetic_session(path, args.drivers, args.seconds)
+    try:
+        replayer = SessionReplayer(path)
+        results = {
+            "log": args.log or f"synthetic ({args.drivers} cars, {args.seconds} s)",
+            "ingest": bench_ingest(replayer, args.repeats),
+            "latency": bench_latency(replayer, args.speed),
+            "memory": bench_memory(replayer, args.repeats),
+        }
+    finally:
+        if tmp is not None:
+            os.unlink(path)
+
+    ingest, latency, memory = results["ingest"], results["latency"], results["memory"]
+    print(f"ingest:  {ingest['messages']} messages, {ingest['rate_per_s']:,.0f} msg/s")
+    print(f"latency: p50 {latency['p50_ms']:.1f} ms, p95 {latency['p95_ms']:.1f} ms, max {latency['max_ms']:.1f} ms "
+          f"(tick {latency['tick_ms']:.1f} ms, speed {latency['speed']})")
+    print(f"memory:  {memory['after_first_mb']:.1f} MB after first replay, {memory['growth_mb']:+.2f} MB over {memory['passes']} replays")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if args.min_rate is not None and ingest["rate_per_s"] < args.min_rate:
+        failures.append(f"ingest {ingest['rate_per_s']:,.0f} msg/s < {args.min_rate:,.0f}")
+    if args.max_p95_ms is not None and latency["p95_ms"] > args.max_p95_ms:
+        failures.append(f"p95 latency {latency['p95_ms']:.1f} ms > {args.max_p95_ms} ms")
+    if args.max_growth_mb is not None and memory["growth_mb"] > args.max_growth_mb:
+        failures.append(f"memory growth {memory['growth_mb']:.2f} MB > {args.max_growth_mb} MB")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
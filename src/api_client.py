@@ -1,26 +1,84 @@
 import requests
-import paho.mqtt.client as mqtt
-import ssl
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 import os
+from datetime import datetime, timedelta, timezone
 import platform  # For BeeWare async
+from .response_cache import ResponseCache
+from .topic_buffer import TopicStore
+from .live_stream import LiveStream
+from .records import LEAN_RECORDS, decode_message
+from .instrumentation import metrics
 
 load_dotenv()
 
+# Endpoints loaded for a full historical session (same set as the live topics)
+SESSION_ENDPOINTS = [
+    "intervals", "position", "laps", "pit", "race_control",
+    "car_data", "weather", "stints", "tyres", "team_radio"
+]
+
+# Cache lifetimes in seconds (None = keep forever)
+CACHE_TTLS = {
+    "live": 30,          # "latest" or still-running sessions
+    "default": 86400,    # lookups not tied to a session (e.g. sessions?year=2025)
+    "finished": None,    # sessions that ended more than FINISHED_GRACE ago
+}
+FINISHED_GRACE = timedelta(hours=1)
+
+# High-volume endpoints that can be fetched in date windows instead of one response
+CHUNKED_ENDPOINTS = ["car_data", "position", "intervals", "location"]
+CHUNK_WINDOW = timedelta(minutes=5)
+
 class OpenF1Client:
-    def __init__(self):
+    def __init__(self, max_concurrency=4, max_retries=3, backoff_factor=0.5, cache=True, topic_capacities=None, lean_records=LEAN_RECORDS):
         self.base_url = "https://api.openf1.org/v1/"
         self.token_url = "https://api.openf1.org/token"
-        self.mqtt_broker = "mqtt.openf1.org"
-        self.mqtt_port = 8883
+        self.mqtt_broker = os.getenv("OPENF1_MQTT_BROKER") or "mqtt.openf1.org"
+        self.mqtt_port = int(os.getenv("OPENF1_MQTT_PORT") or 8883)
+        self.mqtt_tls = os.getenv("OPENF1_MQTT_TLS", "1") != "0"  # 0 for a plain local broker (replays)
         self.username = os.getenv("OPENF1_USERNAME")
         self.password = os.getenv("OPENF1_PASSWORD")
         self.access_token = None
-        self.client = None
-        self.data_queues = {}  # Dict to store incoming data by topic
+        self.token_expires = 0.0  # time.time() when the access token stops being valid
+        self.stream = None  # LiveStream while live mode is running
+        self.data_queues = TopicStore(topic_capacities)  # Ring buffer per topic, filled by on_message
+        self.message_handlers = []  # callables(topic, payload) run for every MQTT message
+        self.recorder = None  # SessionRecorder capturing raw messages, if recording
+        self.lean_records = lean_records  # high-rate topics as slim records (see records.py); on by default with msgspec
         self.connected = False
 
+        # Pooled keep-alive session shared by every REST call
+        self.max_concurrency = max_concurrency
+        self.session = requests.Session()
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._host_limits = {}  # {host: BoundedSemaphore}
+        self._host_limits_lock = threading.Lock()
+
+        # On-disk response cache for historical data
+        self.cache = None
+        if cache and os.getenv("OPENF1_CACHE", "1") != "0":
+            max_mb = int(os.getenv("OPENF1_CACHE_MAX_MB", "2048"))
+            self.cache = ResponseCache(os.getenv("OPENF1_CACHE_DIR"), max_bytes=max_mb * 1024 * 1024)
+        self.cache_ttls = dict(CACHE_TTLS)
+        self._finished_sessions = set()
+        metrics.register_gauges("client", self.queue_gauges)
+
     def get_access_token(self):
         if not self.username or not self.password:
             print("Warning: No credentials provided. Historical mode only.")
@@ -30,25 +88,137 @@ class OpenF1Client:
             "password": self.password
         }
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
-        response = requests.post(self.token_url, data=payload, headers=headers)
+        response = self.session.post(self.token_url, data=payload, headers=headers)
         if response.status_code == 200:
             token_data = response.json()
             self.access_token = token_data.get("access_token")
+            self.token_expires = time.time() + float(token_data.get("expires_in", 3600))
             print("Access token obtained successfully.")
         else:
             raise Exception(f"Error obtaining token: {response.status_code} - {response.text}")
 
-    def fetch_historical(self, endpoint, params=None):
+    def token_expires_in(self):
+        return self.token_expires - time.time() if self.access_token else 0.0
+
+    def fetch_historical(self, endpoint, params=None, use_cache=True):
+        with metrics.span("fetch", endpoint=endpoint):
+            return self._fetch_historical(endpoint, params, use_cache)
+
+    def _fetch_historical(self, endpoint, params, use_cache):
+        if self.cache and use_cache:
+            cached = self.cache.get(endpoint, params)
+            if cached is not None:
+                metrics.count("cache_hits", endpoint=endpoint)
+                return cached
+            metrics.count("cache_misses", endpoint=endpoint)
+        data = self._fetch_remote(endpoint, params)
+        if self.cache and use_cache:
+            ttl = self.cache_ttl(endpoint, params, data)
+            if ttl is None or ttl > 0:
+                self.cache.put(endpoint, params, data, ttl)
+        return data
+
+    def _fetch_remote(self, endpoint, params=None):
         url = f"{self.base_url}{endpoint}"
         headers = {"accept": "application/json"}
         if self.access_token:
             headers["Authorization"] = f"Bearer {self.access_token}"
-        response = requests.get(url, headers=headers, params=params)
+        with self._host_limit(url), metrics.span("http_get", endpoint=endpoint):
+            response = self.session.get(url, headers=headers, params=params)
+        metrics.count("response_bytes", len(response.content), endpoint=endpoint)
         if response.status_code == 200:
             return response.json()
         else:
             raise Exception(f"Error fetching data: {response.status_code} - {response.text}")
 
+    def cache_ttl(self, endpoint, params, data):
+        params = params or {}
+        if any(str(v) == "latest" for v in params.values()):
+            return self.cache_ttls["live"]
+        session_key = params.get("session_key")
+        if session_key is None:
+            return self.cache_ttls["default"]
+        if endpoint == "sessions":
+            # The session lookup decides its own lifetime from date_end
+            finished = bool(data) and self._ended(data[0].get("date_end"))
+        else:
+            finished = self.session_finished(session_key)
+        return self.cache_ttls["finished"] if finished else self.cache_ttls["live"]
+
+    def session_finished(self, session_key):
+        session_key = str(session_key)
+        if session_key not in self._finished_sessions:
+            sessions = self.fetch_historical("sessions", {"session_key": session_key})
+            if not (sessions and self._ended(sessions[0].get("date_end"))):
+                return False
+            self._finished_sessions.add(session_key)
+        return True
+
+    @staticmethod
+    def _ended(date_end):
+        if not date_end:
+            return False
+        try:
+            end = datetime.fromisoformat(date_end)
+        except ValueError:
+            return False
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+        return end + FINISHED_GRACE < datetime.now(timezone.utc)
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache else {}
+
+    def _host_limit(self, url):
+        host = urlparse(url).netloc
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.BoundedSemaphore(self.max_concurrency)
+            return self._host_limits[host]
+
+    def fetch_session(self, session_key, endpoints=None):
+        # Fetch all endpoints of a session concurrently; keys match data_queues topics
+        endpoints = endpoints or SESSION_ENDPOINTS
+        params = {"session_key": session_key}
+        if self.cache:
+            self.session_finished(session_key)  # resolve cache TTL once, not per worker
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = {ep: pool.submit(self.fetch_historical, ep, params) for ep in endpoints}
+            return {f"v1/{ep}": future.result() for ep, future in futures.items()}
+
+    def session_window(self, session_key):
+        sessions = self.fetch_historical("sessions", {"session_key": session_key})
+        if not sessions:
+            raise Exception(f"Unknown session: {session_key}")
+        start = datetime.fromisoformat(sessions[0]["date_start"])
+        end = datetime.fromisoformat(sessions[0]["date_end"])
+        return start, end
+
+    def iter_chunks(self, endpoint, session_key, window=CHUNK_WINDOW, drivers=None, padding=timedelta(minutes=30)):
+        # Yield the session's records window by window (optionally per driver), in date order.
+        # At most max_concurrency requests are in flight, so memory stays bounded.
+        start, end = self.session_window(session_key)
+        start, end = start - padding, end + padding  # telemetry starts before/after the official times
+        requests_params = []
+        t = start
+        while t < end:
+            t_next = min(t + window, end)
+            for driver in (drivers or [None]):
+                params = {"session_key": session_key, "date>=": t.isoformat(), "date<": t_next.isoformat()}
+                if driver is not None:
+                    params["driver_number"] = driver
+                requests_params.append(params)
+            t = t_next
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            pending = deque()
+            for params in requests_params:
+                pending.append(pool.submit(self.fetch_historical, endpoint, params))
+                if len(pending) >= self.max_concurrency:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
     # Specific fetch methods (unchanged)
     def fetch_intervals(self, session_key):
         params = {"session_key": session_key}
@@ -61,39 +231,58 @@ class OpenF1Client:
             self.connected = True
             topics = [
                 "v1/intervals", "v1/position", "v1/laps", "v1/pit", "v1/race_control",
-                "v1/car_data", "v1/weather", "v1/stints", "v1/tyres", "v1/team_radio"
+                "v1/car_data", "v1/weather", "v1/stints", "v1/tyres", "v1/team_radio",
+                "v1/location"
             ]
             for topic in topics:
                 client.subscribe(topic)
-                self.data_queues[topic] = []
+                self.data_queues.add(topic)
         else:
             print(f"Failed to connect, return code {rc}")
 
     def on_message(self, client, userdata, msg):
-        payload = json.loads(msg.payload.decode())
-        topic = msg.topic
-        if topic in self.data_queues:
-            self.data_queues[topic].append(payload)
-            if len(self.data_queues[topic]) > 500:
-                self.data_queues[topic] = self.data_queues[topic][-500:]
-
-    async def start_mqtt_stream(self):
-        if not self.access_token:
-            self.get_access_token()
-        if not self.access_token:
-            raise Exception("Access token required for live mode.")
-        self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-        self.client.username_pw_set(username=self.username, password=self.access_token)
-        self.client.tls_set(cert_reqs=ssl.CERT_REQUIRED, tls_version=ssl.PROTOCOL_TLS_CLIENT)
-        self.client.on_connect = self.on_connect
-        self.client.on_message = self.on_message
-        self.client.connect(self.mqtt_broker, self.mqtt_port, 60)
-        self.client.loop_start()  # Run in background for async
+        self.dispatch(msg.topic, msg.payload)
+
+    def dispatch(self, topic, raw):
+        # Raw MQTT payload -> topic buffer and message handlers; returns the decoded message
+        if self.recorder is not None:
+            self.recorder.record(topic, raw)
+        payload = decode_message(topic, raw, self.lean_records)
+        self.data_queues.append(topic, payload)
+        for handler in self.message_handlers:
+            handler(topic, payload)
+        return payload
+
+    async def start_mqtt_stream(self, **stream_options):
+        # Runs on the caller's event loop; see LiveStream for queues, backpressure and reconnects
+        self.stop_mqtt_stream()
+        self.stream = LiveStream(self, **stream_options)
+        await self.stream.start()
+        return self.stream
 
     def stop_mqtt_stream(self):
-        if self.client:
-            self.client.loop_stop()
-            self.client.disconnect()
+        if self.stream:
+            self.stream.stop()
+            self.stream = None
+
+    def close(self):
+        self.stop_mqtt_stream()
+        self.session.close()
 
     def get_latest_data(self, topic):
-        return self.data_queues.get(f"v1/{topic}", [])
+        buffer = self.data_queues.get(f"v1/{topic}")
+        return buffer.snapshot() if buffer else []
+
+    def snapshot_queues(self):
+        return self.data_queues.snapshot()
+
+    def queue_gauges(self):
+        # Polled at snapshot time so the per-message path stays free of metric updates
+        gauges = [("topic_buffer_depth", {"topic": topic}, len(buffer)) for topic, buffer in self.data_queues.items()]
+        gauges += [("mqtt_messages", {"topic": topic}, buffer.total) for topic, buffer in self.data_queues.items()]
+        if self.stream is not None:
+            for topic, queues in list(self.stream.queues.items()):
+                gauges.append(("stream_queue_depth", {"topic": topic}, sum(q.qsize() for q in queues)))
+            gauges += [("stream_dropped", {"topic": topic}, n) for topic, n in list(self.stream.dropped.items())]
+            gauges.append(("stream_reconnects", {}, self.stream.reconnects))
+        return gauges
@@ -1,32 +1,38 @@
 import toga
 from toga.style import Pack
 from toga.constants import COLUMN
-import plotly.express as px
 import pandas as pd
-import platform
 import asyncio
 import webbrowser
-import requests
-import json
-import geopandas as gpd
-import folium
-from io import StringIO
 from dotenv import load_dotenv
-import os
-from math import radians, sin, cos, sqrt, atan2
-import numpy as np
-import googlemaps  # If key set
-from .api_client import OpenF1Client
-from .insights_engine import InsightsEngine
+import time
+from functools import partial
+from .api_client import OpenF1Client, SESSION_ENDPOINTS, CHUNKED_ENDPOINTS
+from .insights_engine import InsightsEngine, SESSION_WIDE_INSIGHTS
+from .downsample import downsample_frame
+from .circuit_store import CircuitStore
+from .elevation import ElevationService
+from .track_position import TrackModel, PositionTracker
+from .instrumentation import metrics, MetricsExporter, Profiler
 
 load_dotenv()
 
 class OpenF1LiveInsights(toga.App):
     def startup(self):
+        self.profiler = Profiler().start()  # OPENF1_PROFILE=cprofile|pyinstrument
+        self.metrics_exporter = MetricsExporter().start()  # OPENF1_METRICS_FILE=metrics.json|metrics.prom
         self.client = OpenF1Client()
-        self.engine = InsightsEngine()
+        self.engine = InsightsEngine(incremental=True)
+        self.circuits = CircuitStore(http=self.client.session)
+        self.elevation = ElevationService(self.circuits)
+        self.client.message_handlers.append(self.engine.apply_message)
         self.insights = {}
+        self.session_insights = {}  # end-of-session historical insights, the base for timeline scrubbing
+        self.session_frames = {}  # {topic: typed frame} of the loaded historical session
+        self.chart_stats = {}  # {chart: {"points", "render_ms", "html_bytes"}}
+        self.tab_rendered = {}  # {tab title: (insight versions, filter inputs) last rendered}
         self.live_task = None
+        self.live_refresh_interval = 0.2 if self.engine.incremental else 10  # min seconds between live refreshes
 
         # Inputs
         session_label = toga.Label("Session Key:")
@@ -44,6 +50,10 @@ class OpenF1LiveInsights(toga.App):
         # Load button
         load_button = toga.Button("Load Data", on_press=self.load_data)
 
+        # Timeline scrub (historical mode): seconds since the first event of the session
+        self.scrub_slider = toga.Slider(min=0, max=1, value=1, on_change=self.on_scrub, enabled=False)
+        self.scrub_label = toga.Label("Timeline: N/A")
+
         # OptionContainer for tabs
         self.tabs = toga.OptionContainer(style=Pack(flex=1))
         self.tabs.add("Standings", self.build_standings_tab())
@@ -53,6 +63,9 @@ class OpenF1LiveInsights(toga.App):
         self.tabs.add("Pits & Events", self.build_pits_tab())
         self.tabs.add("Weather & Radio", self.build_weather_tab())
         self.tabs.add("Track Map", self.build_track_tab())  # Inserted here
+        self.tabs.add("Perf", self.build_perf_tab())
+        self.tabs.on_select = self.on_tab_select
+        self.on_exit = self.shutdown
 
         # Main box
         main_box = toga.Box(
@@ -62,6 +75,7 @@ class OpenF1LiveInsights(toga.App):
                 mode_label, self.mode,
                 self.selected_driver, self.selected_team, self.selected_tire,
                 load_button,
+                self.scrub_slider, self.scrub_label,
                 self.tabs
             ],
             style=Pack(direction=COLUMN, padding=10, flex=1)
@@ -82,285 +96,474 @@ class OpenF1LiveInsights(toga.App):
             # Update selections
             self.selected_driver.items = ["All"] + list(self.engine.drivers.values())
             self.selected_team.items = ["All"] + list(set(self.engine.teams.values()))
+            self.telemetry_compare.items = ["None"] + list(self.engine.drivers.values())
 
             if mode == "live":
+                self.session_frames = {}
+                self.engine.timeline = None
+                self.scrub_slider.enabled = False
+                self.engine.live_state.reset()
+                self.engine.track_tracker = None
+                self.track_reference_ticks = 0
+                self.track_reference_future = None
                 await self.client.start_mqtt_stream()
                 self.live_task = self.add_background_task(self.live_update_loop)
             else:
-                data_queues = {
-                    "v1/intervals": self.client.fetch_intervals(session_key),
-                    "v1/position": self.client.fetch_positions(session_key),
-                    "v1/laps": self.client.fetch_laps(session_key),
-                    "v1/pit": self.client.fetch_pits(session_key),
-                    "v1/race_control": self.client.fetch_race_control(session_key),
-                    "v1/car_data": self.client.fetch_car_data(session_key),
-                    "v1/weather": self.client.fetch_weather(session_key),
-                    "v1/stints": self.client.fetch_stints(session_key),
-                    "v1/tyres": self.client.fetch_tyres(session_key),
-                    "v1/team_radio": self.client.fetch_team_radio(session_key),
-                }
+                # Typed frames from the local columnar store (fetched concurrently on first load).
+                # Fetches and Parquet writes block, so they run in the default executor.
+                loop = asyncio.get_running_loop()
+                streamed = self.engine.store.missing(session_key, [ep for ep in SESSION_ENDPOINTS if ep in CHUNKED_ENDPOINTS])
+                data_queues = await loop.run_in_executor(None, partial(self.engine.load_session, self.client, session_key,
+                                                                       endpoints=[ep for ep in SESSION_ENDPOINTS if ep not in streamed]))
+                self.session_frames = data_queues
                 self.insights = self.engine.generate_insights(data_queues, mode="historical")
                 self.refresh_ui()
+
+                # High-volume endpoints arrive in date windows; render after the first one
+                for endpoint in streamed:
+                    chunks = []
+                    windows = self.engine.stream_session(self.client, session_key, endpoint)
+                    # Each window's HTTP fetch and row-group write runs off the UI loop
+                    while (chunk := await loop.run_in_executor(None, next, windows, None)) is not None:
+                        chunks.append(chunk)
+                        if len(chunks) == 1:
+                            data_queues[f"v1/{endpoint}"] = chunk
+                            self.insights = self.engine.generate_insights(data_queues, mode="historical")
+                            self.refresh_ui()
+                    # Finished sessions are read back from the store; running ones stay in memory
+                    if self.engine.store.has(session_key, endpoint):
+                        data_queues[f"v1/{endpoint}"] = self.engine.store.read(session_key, endpoint)
+                    elif chunks:
+                        data_queues[f"v1/{endpoint}"] = pd.concat(chunks, ignore_index=True)
+                if streamed:
+                    self.insights = self.engine.generate_insights(data_queues, mode="historical")
+                    self.refresh_ui()
+                if "telemetry_index" in self.insights:
+                    self.telemetry_lap.items = ["Fastest", "Full session"] + [str(n) for n in self.insights["telemetry_index"].lap_numbers()]
+
+                # Checkpointed state for scrubbing, built off the UI loop; starts at the end of the session
+                self.session_insights = self.insights
+                self.scrub_slider.enabled = False
+                self.scrub_label.text = "Timeline: building..."
+                timeline = await loop.run_in_executor(None, self.engine.build_timeline, data_queues)
+                if self.session_frames is not data_queues:
+                    return  # another session was loaded meanwhile
+                self.engine.timeline = timeline
+                self.scrub_slider.max = max(timeline.duration, 1)
+                self.scrub_slider.value = self.scrub_slider.max
+                self.scrub_slider.enabled = True
+                self.on_scrub(self.scrub_slider)
         except Exception as e:
             self.main_window.info_dialog("Error", str(e))
 
-    async def live_update_loop(self):
-        while True:
-            self.insights = self.engine.generate_insights(self.client.data_queues, mode="live")
-            await asyncio.sleep(10)
-            platform.loop.call_soon(self.refresh_ui)
+    async def live_update_loop(self, *args):
+        # Woken by the stream as soon as messages arrive; bursts within live_refresh_interval
+        # are coalesced into one refresh so a busy stream cannot starve the UI.
+        stream = self.client.stream
+        while stream is self.client.stream:
+            if not await stream.wait_for_update(timeout=5.0):
+                continue
+            started = time.perf_counter()
+            # Incremental mode reads the engine's running state, so skip copying the raw buffers
+            with metrics.span("live_tick"):
+                data_queues = None if self.engine.incremental else self.client.snapshot_queues()
+                self.insights = self.engine.generate_insights(data_queues, mode="live")
+                self.push_track_positions()
+                self.refresh_ui()
+            await asyncio.sleep(max(0.0, self.live_refresh_interval - (time.perf_counter() - started)))
+
+    def on_scrub(self, widget):
+        # Rebuild the insights as they stood at the slider position; at the far end the
+        # whole-session analytics (stint analysis, sector deltas, ...) are shown as well.
+        timeline = self.engine.timeline
+        if timeline is None or not self.scrub_slider.enabled:
+            return
+        offset = float(self.scrub_slider.value)
+        timestamp = timeline.start + int(offset * 1e9)
+        insights = self.engine.insights_at(timestamp)
+        at_end = offset >= float(self.scrub_slider.max)
+        session = self.session_insights if at_end else {k: v for k, v in self.session_insights.items() if k in SESSION_WIDE_INSIGHTS}
+        versions = {**insights["versions"], **{k: v for k, v in self.session_insights.get("versions", {}).items() if k in session}}
+        self.insights = {**insights, **{k: v for k, v in session.items() if k != "versions"}, "versions": versions}
+        minutes, seconds = divmod(int(offset), 60)
+        self.scrub_label.text = f"Lap {timeline.lap_at(timestamp)} - {minutes // 60}:{minutes % 60:02d}:{seconds:02d}"
+        self.refresh_ui()
+
+    def push_track_positions(self):
+        # Live cars on the track view: JSON deltas into the loaded page, never a full re-render
+        if self.engine.track_tracker is None:
+            self.track_reference_ticks = getattr(self, "track_reference_ticks", 0) + 1
+            pending = getattr(self, "track_reference_future", None)
+            if self.track_reference_ticks % 60 != 1 or (pending is not None and not pending.done()):
+                return  # retry until a reference lap exists, one fetch at a time
+            # REST fetch and projection run in the executor; the tracker is installed on the loop
+            self.track_reference_future = asyncio.get_running_loop().run_in_executor(None, self.load_track_model, self.session_key.value)
+            self.track_reference_future.add_done_callback(self.on_track_model)
+            return
+        positions = self.insights.get("track_positions")
+        if positions is not None and not positions.empty:
+            script = self.engine.track_tracker.delta_script(positions)
+            if script:
+                self.track_live_view.evaluate_javascript(script)
+
+    def load_track_model(self, session_key):
+        circuit_id = self.circuits.resolve(getattr(self, "circuit_key", None))
+        circuit = self.circuits.geometry(circuit_id) if circuit_id else None
+        return TrackModel.fetch(self.client, session_key, lap_length_m=circuit["length_m"] if circuit else None)
+
+    def on_track_model(self, future):
+        try:
+            model = future.result()
+        except Exception as e:
+            print(f"Track reference error: {e}")
+            return
+        if model is None or future is not self.track_reference_future:
+            return  # no reference lap yet, or a fetch for a session that has since been reloaded
+        self.engine.track_tracker = PositionTracker(model)
+        self.track_live_view.set_content('about:blank', model.svg_html())
 
     def filter_data(self, widget):
         self.refresh_ui()
 
-    def refresh_ui(self):
-        # Extract filters
-        selected_driver = self.selected_driver.value
-        selected_team = self.selected_team.value
-        selected_tire = self.selected_tire.value
+    def refresh_ui(self, force=False):
+        # Rebuild only the tabs whose insight versions or filter inputs changed since they
+        # were last rendered; hidden tabs are rebuilt when they are selected.
+        f = self.current_filters()
+        visible = self.current_tab_title()
+        versions = self.insights.get("versions", {})
+        for section, (title, keys, inputs, refresh) in self.tab_specs().items():
+            signature = (tuple(versions.get(k, "missing" if k not in self.insights else id(self.insights[k])) for k in keys),
+                         tuple(f[name] for name in inputs))
+            if not force and self.tab_rendered.get(section) == signature:
+                continue
+            if visible is not None and title != visible:
+                continue  # stale, rebuilt lazily on selection
+            try:
+                with metrics.span("refresh", section=section):
+                    refresh(f)
+                self.tab_rendered[section] = signature
+            except Exception as e:
+                print(f"UI refresh error ({section}): {e}")
+
+    def tab_specs(self):
+        # {section: (tab title, insight keys, filter inputs, refresh method)}
+        return {
+            "Standings": ("Standings", ["standings"], ["driver", "team"], self.refresh_standings_tab),
+            "Laps": ("Laps", ["laps", "fastest_lap", "average_lap_times"], ["driver", "team"], self.refresh_laps_tab),
+            "Telemetry": ("Telemetry", ["telemetry_index", "telemetry", "fastest_lap"], ["driver", "team", "telemetry_lap", "telemetry_compare"], self.refresh_telemetry_tab),
+            "Stints & Tires": ("Stints & Tires", ["stint_analysis", "stints", "tyres"], ["driver", "team", "tire"], self.refresh_stints_tab),
+            "Pits & Events": ("Pits & Events", ["pits", "pit_counts", "recent_pits", "race_events"], ["driver", "team"], self.refresh_pits_tab),
+            "Weather & Radio": ("Weather & Radio", ["weather", "team_radio"], ["driver", "team"], self.refresh_weather_tab),
+            "Track Map": ("Track Map", [], ["session"], self.refresh_track_tab),
+            "Track Positions": ("Track Map", ["track_positions"], ["driver", "team"], self.refresh_track_positions),
+            "Perf": ("Perf", [], ["generation"], self.refresh_perf_tab),
+        }
 
-        selected_driver_num = next((k for k, v in self.engine.drivers.items() if v == selected_driver), None) if selected_driver != "All" else None
-        selected_team_drivers = [k for k, v in self.engine.teams.items() if v == selected_team] if selected_team != "All" else None
+    def current_tab_title(self):
+        tab = getattr(self.tabs, "current_tab", None)
+        return getattr(tab, "text", None) or getattr(tab, "label", None)
 
-        def filter_df(df, col="driver_number"):
-            if selected_driver_num:
-                df = df[df[col] == selected_driver_num]
-            elif selected_team_drivers:
-                df = df[df[col].isin(selected_team_drivers)]
-            return df
+    def on_tab_select(self, widget, **kwargs):
+        self.refresh_ui()
 
-        try:
-            # Standings Tab
-            if "standings" in self.insights:
-                df_standings = filter_df(self.insights["standings"])
-                df_standings["driver"] = df_standings["driver_number"].map(self.engine.drivers)
-                data = []
-                for _, row in df_standings.iterrows():
-                    data.append((row["driver"], str(row.get("gap_to_leader", row.get("position", "N/A"))), str(row.get("interval", "N/A"))))
-                self.standings_table.data = data
-
-            # Laps Tab
-            if "laps" in self.insights:
-                df_laps = filter_df(self.insights["laps"]).head(50)  # Limit for performance
-                lap_data = []
-                for _, row in df_laps.iterrows():
-                    lap_data.append((row["lap_number"], row["lap_duration"], row.get("duration_sector_1", "N/A"), row.get("duration_sector_2", "N/A"), row.get("duration_sector_3", "N/A")))
-                self.laps_table.data = lap_data
-
-                if not df_laps.empty:
-                    fig = px.line(df_laps, x="lap_number", y="lap_duration", color="driver_number", title="Lap Times")
-                    html = fig.to_html(include_plotlyjs='cdn')
-                    self.laps_chart.set_content('about:blank', html)
-                else:
-                    self.laps_chart.set_content('about:blank', '<p>No lap data available</p>')
-
-            if "fastest_lap" in self.insights:
-                fl = self.insights["fastest_lap"]
-                driver = self.engine.drivers.get(fl["driver_number"], "Unknown")
-                self.fastest_lap_label.text = f"Fastest Lap: {driver} - {fl['time']}s"
-
-            if "average_lap_times" in self.insights:
-                avg_laps = self.insights["average_lap_times"]
-                avg_text = "Average Lap Times:\n"
-                for num, avg in avg_laps.items():
-                    driver = self.engine.drivers.get(num, f"#{num}")
-                    avg_text += f"- {driver}: {avg:.3f}s\n"
-                self.avg_laps_label.text = avg_text
-            else:
-                self.avg_laps_label.text = "Average laps: N/A (Live mode only)"
-
-            # Telemetry Tab
-            if "telemetry" in self.insights:
-                df_tele = filter_df(self.insights["telemetry"]).head(500)  # Limit for performance
-                if not df_tele.empty:
-                    fig_speed = px.line(df_tele, x="date", y="speed", title="Speed Over Time")
-                    self.telemetry_speed_chart.set_content('about:blank', fig_speed.to_html(include_plotlyjs='cdn'))
-
-                    fig_rpm = px.line(df_tele, x="date", y="rpm", title="RPM Over Time")
-                    self.telemetry_rpm_chart.set_content('about:blank', fig_rpm.to_html(include_plotlyjs='cdn'))
-
-                    fig_throttle = px.line(df_tele, x="date", y=["throttle", "brake"], title="Throttle/Brake")
-                    self.telemetry_throttle_chart.set_content('about:blank', fig_throttle.to_html(include_plotlyjs='cdn'))
-                else:
-                    self.telemetry_speed_chart.set_content('about:blank', '<p>No telemetry data</p>')
-                    # Similarly for others
-
-            # Stints & Tires Tab
-            if "stints" in self.insights:
-                stints_dict = self.insights["stints"]
-                if selected_driver_num:
-                    stints_dict = {selected_driver_num: stints_dict.get(selected_driver_num)}
-                elif selected_team_drivers:
-                    stints_dict = {k: v for k, v in stints_dict.items() if k in selected_team_drivers}
-
-                stint_data = []
-                for num, data in stints_dict.items():
-                    driver = self.engine.drivers.get(num, f"#{num}")
-                    df_stint = pd.DataFrame(data)
-                    if selected_tire != "All":
-                        df_stint = df_stint[df_stint["compound"] == selected_tire.upper()]
-                    for _, row in df_stint.iterrows():
-                        stint_data.append((driver, row["lap_start"], row["lap_end"], row["compound"], row["tyre_age_at_start"]))
-                self.stints_table.data = stint_data
-
-            if "tyres" in self.insights:
-                df_tyres = filter_df(self.insights["tyres"])
-                if selected_tire != "All":
-                    df_tyres = df_tyres[df_tyres["compound"] == selected_tire.upper()]
-                tyre_data = [(row["driver_number"], row["compound"], row["fresh_tyre"]) for _, row in df_tyres.iterrows()]
-                self.tyres_table.data = tyre_data
-
-            # Pits & Events Tab
-            if "pits" in self.insights:
-                df_pits = filter_df(self.insights["pits"]).head(50)
-                pits_data = [(row["driver_number"], row["lap_number"], row["pit_duration"]) for _, row in df_pits.iterrows()]
-                self.pits_table.data = pits_data
-
-            if "pit_counts" in self.insights:  # Historical
-                pit_counts = self.insights["pit_counts"]
-                counts_data = [(self.engine.drivers.get(num, f"#{num}"), count) for num, count in pit_counts.items()]
-                self.pit_counts_table.data = counts_data
-            elif "recent_pits" in self.insights:  # Live
-                df_recent = self.insights["recent_pits"]
-                recent_data = [(row["driver_number"], row["lap_number"], row["pit_duration"]) for _, row in df_recent.iterrows()]
-                self.pit_counts_table.data = recent_data
-
-            if "race_events" in self.insights:
-                df_events = self.insights["race_events"].head(50)
-                events_data = [(row.get("category", "N/A"), row.get("flag", "N/A"), row.get("message", "N/A")) for _, row in df_events.iterrows()]
-                self.events_table.data = events_data
-
-            # Weather & Radio Tab
-            if "weather" in self.insights:
-                w = self.insights["weather"]
-                self.air_temp_label.text = f"Air Temp: {w.get('air_temp', 'N/A')}°C"
-                self.track_temp_label.text = f"Track Temp: {w.get('track_temp', 'N/A')}°C"
-                self.rainfall_label.text = f"Rainfall: {w.get('rainfall', 'N/A')}"
-                self.wind_speed_label.text = f"Wind Speed: {w.get('wind_speed', 'N/A')} m/s"
-
-            if "team_radio" in self.insights:
-                df_radio = filter_df(self.insights["team_radio"]).head(20)
-                radio_data = []
-                for _, row in df_radio.iterrows():
-                    driver = self.engine.drivers.get(row["driver_number"], f"#{row['driver_number']}")
-                    url = row.get('recording_url', 'No URL')
-                    radio_data.append((driver, row['date'], url))
-                self.radio_table.data = radio_data
-                # Add on_activate to open URL
-                self.radio_table.on_activate = self.open_radio_url
-
-            # Track Map Tab
-            try:
-                # Get circuit from session (fetch if not cached)
-                if not hasattr(self, 'circuit_name'):
-                    session_data = self.client.fetch_historical("sessions", params={"session_key": self.session_key.value})
-                    if session_data:
-                        circuit_key = session_data[0].get("circuit_key")
-                        circuit_data = self.client.fetch_historical("circuits", params={"circuit_key": circuit_key})
-                        self.circuit_name = circuit_data[0].get("circuit_name") if circuit_data else "Unknown"
-                    else:
-                        self.circuit_name = "Unknown"
-
-                if self.circuit_name != "Unknown":
-                    file_name = self.get_geojson_filename(self.circuit_name)
-                    if file_name:
-                        geojson = self.fetch_geojson(file_name)
-                        if geojson:
-                            # Parse and visualize
-                            gdf = gpd.GeoDataFrame.from_features(geojson["features"])
-                            self.track_properties_label.text = f"Name: {gdf['name'][0]}\nLocation: {gdf['location'][0]}, {gdf['country'][0]}\nAltitude: {gdf['altitude'][0]}m"
-
-                            # Interactive Map with Folium
-                            m = folium.Map(location=[gdf.centroid.y.mean(), gdf.centroid.x.mean()], zoom_start=14)
-                            folium.GeoJson(gdf.to_json(), name="Track Layout").add_to(m)
-                            html = m._repr_html_()
-                            self.track_map_view.set_content('about:blank', html)
-
-                            # Elevation (single value; for profile if key set)
-                            elevation_text = f"Altitude: {gdf['altitude'][0]}m"
-                            self.track_elevation_label.text = elevation_text
-
-                            if os.getenv("GOOGLE_API_KEY"):
-                                gmaps = googlemaps.Client(key=os.getenv("GOOGLE_API_KEY"))
-                                # Get path (swap lon/lat to lat/lon)
-                                if gdf.geometry.iloc[0].type == 'LineString':
-                                    path = [(lat, lon) for lon, lat in gdf.geometry.iloc[0].coords]
-                                    elevations = gmaps.elevation_along_path(path=path, samples=50)
-                                    # Compute cumulative distances
-                                    distances = np.cumsum([0] + [self.haversine(elevations[i]['location'], elevations[i+1]['location']) for i in range(len(elevations)-1)])
-                                    fig = px.line(x=distances, y=[e['elevation'] for e in elevations], title="Elevation Profile (m)")
-                                    self.track_elevation_chart.set_content('about:blank', fig.to_html(include_plotlyjs='cdn'))
-                                else:
-                                    self.track_elevation_chart.set_content('about:blank', '<p>No LineString geometry for profile</p>')
-                            else:
-                                self.track_elevation_chart.set_content('about:blank', '<p>Set GOOGLE_API_KEY for profile</p>')
-
-                            # Turns Table (placeholder)
-                            turns_data = []  # Expand if 'turns' property added in future
-                            self.track_turns_table.data = turns_data or [("No detailed turns available",)]
-
-                        else:
-                            self.track_map_view.set_content('about:blank', '<p>No GeoJSON found</p>')
-                    else:
-                        self.track_map_view.set_content('about:blank', '<p>No matching GeoJSON file</p>')
-            except Exception as e:
-                print(f"Track refresh error: {e}")
-
-    def haversine(self, loc1, loc2):
-        lat1, lon1 = loc1['lat'], loc1['lng']
-        lat2, lon2 = loc2['lat'], loc2['lng']
-        R = 6371  # km
-        dlat = radians(lat2 - lat1)
-        dlon = radians(lon2 - lon1)
-        a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
-        return R * c * 1000  # meters
-
-    def get_geojson_filename(self, circuit_name):
-        # Hardcoded mapping (extended from previous)
-        mapping = {
-            "Albert Park Grand Prix Circuit": "au-1953.geojson",
-            "Baku City Circuit": "az-2016.geojson",
-            "Circuit de Barcelona-Catalunya": "es-1991.geojson",
-            "Autódromo Oscar y Juan Gálvez": "ar-1952.geojson",
-            "Hungaroring": "hu-1986.geojson",
-            "Watkins Glen": "us-1956.geojson",
-            "Autódromo do Estoril": "pt-1972.geojson",
-            "Hockenheimring": "de-1932.geojson",
-            "Autodromo Enzo e Dino Ferrari": "it-1953.geojson",
-            "Indianapolis Motor Speedway": "us-1909.geojson",
-            "Istanbul Park": "tr-2005.geojson",
-            "Autódromo Internacional Nelson Piquet": "br-1977.geojson",
-            "Jeddah Corniche Circuit": "sa-2021.geojson",
-            "Kyalami": "za-1961.geojson",
-            "Las Vegas Street Circuit": "us-2023.geojson",
-            "Circuit Paul Ricard": "fr-1969.geojson",
-            "Losail International Circuit": "qa-2004.geojson",
-            "Madrid Street Circuit": "es-2026.geojson",
-            "Circuit de Nevers Magny-Cours": "fr-1960.geojson",
-            "Autódromo Hermanos Rodríguez": "mx-1962.geojson",
-            "Miami International Autodrome": "us-2022.geojson",
-            "Circuit de Monaco": "mc-1929.geojson",
-            "Circuit Gilles Villeneuve": "ca-1978.geojson",
-            "Autodromo Nazionale di Monza": "it-1922.geojson",
-            "Circuit de Spa-Francorchamps": "be-1924.geojson",
-            "Silverstone Circuit": "gb-1948.geojson",
-            "Suzuka International Racing Course": "jp-1962.geojson",
-            "Red Bull Ring": "at-1969.geojson",
-            "Circuit of the Americas": "us-2012.geojson",
-            # Add more from repo as needed (e.g., "Bahrain International Circuit": "bh-2004.geojson", etc.)
+    def current_filters(self):
+        selected_driver = self.selected_driver.value
+        selected_team = self.selected_team.value
+        return {
+            "driver": selected_driver,
+            "team": selected_team,
+            "tire": self.selected_tire.value,
+            "driver_num": self.engine.driver_numbers.get(selected_driver) if selected_driver != "All" else None,
+            "team_drivers": self.engine.team_drivers.get(selected_team) if selected_team != "All" else None,
+            "telemetry_lap": self.telemetry_lap.value,
+            "telemetry_compare": self.telemetry_compare.value,
+            "session": self.session_key.value,
+            "generation": self.engine.generation,
         }
-        return mapping.get(circuit_name)
 
-    def fetch_geojson(self, file_name):
-        url = f"https://raw.githubusercontent.com/bacinger/f1-circuits/master/circuits/{file_name}"
+    def filter_insight(self, f, key):
+        # Index lookup on the engine's precomputed driver -> rows map, no per-refresh masking
+        drivers = [f["driver_num"]] if f["driver_num"] else f["team_drivers"]
+        return self.engine.filter_frame(key, self.insights[key], drivers)
+
+    def refresh_standings_tab(self, f):
+        if "standings" in self.insights:
+            df_standings = self.filter_insight(f, "standings")
+            df_standings = df_standings.assign(driver=df_standings["driver_number"].map(self.engine.drivers))
+            data = []
+            for _, row in df_standings.iterrows():
+                data.append((row["driver"], str(row.get("gap_to_leader", row.get("position", "N/A"))), str(row.get("interval", "N/A"))))
+            self.standings_table.data = data
+
+    def refresh_laps_tab(self, f):
+        import plotly.express as px  # charting is only loaded once a chart tab renders
+        if "laps" in self.insights:
+            df_laps = self.filter_insight(f, "laps").head(50)  # Limit for performance
+            lap_data = []
+            for _, row in df_laps.iterrows():
+                lap_data.append((row["lap_number"], row["lap_duration"], row.get("duration_sector_1", "N/A"), row.get("duration_sector_2", "N/A"), row.get("duration_sector_3", "N/A")))
+            self.laps_table.data = lap_data
+
+            if not df_laps.empty:
+                df_chart = downsample_frame(self.filter_insight(f, "laps").dropna(subset=["lap_duration"]), "lap_number", "lap_duration",
+                                            self.chart_points(self.laps_chart), by="driver_number", method="lttb")
+                fig = px.line(df_chart, x="lap_number", y="lap_duration", color="driver_number", title="Lap Times")
+                self.set_chart("laps", self.laps_chart, fig, len(df_chart))
+            else:
+                self.laps_chart.set_content('about:blank', '<p>No lap data available</p>')
+
+        if "fastest_lap" in self.insights:
+            fl = self.insights["fastest_lap"]
+            driver = self.engine.drivers.get(fl["driver_number"], "Unknown")
+            self.fastest_lap_label.text = f"Fastest Lap: {driver} - {fl['time']}s"
+
+        if "average_lap_times" in self.insights:
+            avg_laps = self.insights["average_lap_times"]
+            avg_text = "Average Lap Times:\n"
+            for num, avg in avg_laps.items():
+                driver = self.engine.drivers.get(num, f"#{num}")
+                avg_text += f"- {driver}: {avg:.3f}s\n"
+            self.avg_laps_label.text = avg_text
+        else:
+            self.avg_laps_label.text = "Average laps: N/A (Live mode only)"
+
+    def refresh_telemetry_tab(self, f):
+        if "telemetry_index" in self.insights:
+            self.refresh_lap_telemetry(self.insights["telemetry_index"], f["driver_num"])
+        elif "telemetry" in self.insights:
+            df_tele = self.filter_insight(f, "telemetry")
+            if not df_tele.empty:
+                self.plot_telemetry(df_tele, "date")
+                self.telemetry_stats_label.text = self.chart_stats_text()
+            else:
+                self.telemetry_speed_chart.set_content('about:blank', '<p>No telemetry data</p>')
+                # Similarly for others
+
+    def refresh_stints_tab(self, f):
+        if "stint_analysis" in self.insights and not self.insights["stint_analysis"].empty:
+            df_stint = self.filter_insight(f, "stint_analysis")
+            if f["tire"] != "All":
+                df_stint = df_stint[df_stint["compound"] == f["tire"].upper()]
+            driver_names = df_stint["driver_number"].map(self.engine.drivers).fillna("#" + df_stint["driver_number"].astype(str))
+            columns = [driver_names, df_stint["lap_start"], df_stint["lap_end"], df_stint["compound"], df_stint["tyre_age_at_start"],
+                       df_stint["fuel_corrected_pace"].round(3), df_stint["deg_per_lap"].round(3)]
+            self.stints_table.data = list(zip(*columns))
+        elif "stints" in self.insights:
+            stints_dict = self.insights["stints"]
+            if f["driver_num"]:
+                stints_dict = {f["driver_num"]: stints_dict.get(f["driver_num"])}
+            elif f["team_drivers"]:
+                stints_dict = {k: v for k, v in stints_dict.items() if k in f["team_drivers"]}
+
+            stint_data = []
+            for num, data in stints_dict.items():
+                driver = self.engine.drivers.get(num, f"#{num}")
+                df_stint = pd.DataFrame(data)
+                if f["tire"] != "All":
+                    df_stint = df_stint[df_stint["compound"] == f["tire"].upper()]
+                for _, row in df_stint.iterrows():
+                    stint_data.append((driver, row["lap_start"], row["lap_end"], row["compound"], row["tyre_age_at_start"], "N/A", "N/A"))
+            self.stints_table.data = stint_data
+
+        if "tyres" in self.insights:
+            df_tyres = self.filter_insight(f, "tyres")
+            if f["tire"] != "All":
+                df_tyres = df_tyres[df_tyres["compound"] == f["tire"].upper()]
+            tyre_data = [(row["driver_number"], row["compound"], row["fresh_tyre"]) for _, row in df_tyres.iterrows()]
+            self.tyres_table.data = tyre_data
+
+    def refresh_pits_tab(self, f):
+        if "pits" in self.insights:
+            df_pits = self.filter_insight(f, "pits").head(50)
+            pits_data = [(row["driver_number"], row["lap_number"], row["pit_duration"]) for _, row in df_pits.iterrows()]
+            self.pits_table.data = pits_data
+
+        if "pit_counts" in self.insights:  # Historical
+            pit_counts = self.insights["pit_counts"]
+            counts_data = [(self.engine.drivers.get(num, f"#{num}"), count) for num, count in pit_counts.items()]
+            self.pit_counts_table.data = counts_data
+        elif "recent_pits" in self.insights:  # Live
+            df_recent = self.insights["recent_pits"]
+            recent_data = [(row["driver_number"], row["lap_number"], row["pit_duration"]) for _, row in df_recent.iterrows()]
+            self.pit_counts_table.data = recent_data
+
+        if "race_events" in self.insights:
+            df_events = self.insights["race_events"].head(50)
+            events_data = [(row.get("category", "N/A"), row.get("flag", "N/A"), row.get("message", "N/A")) for _, row in df_events.iterrows()]
+            self.events_table.data = events_data
+
+    def refresh_weather_tab(self, f):
+        if "weather" in self.insights:
+            w = self.insights["weather"]
+            self.air_temp_label.text = f"Air Temp: {w.get('air_temp', 'N/A')}°C"
+            self.track_temp_label.text = f"Track Temp: {w.get('track_temp', 'N/A')}°C"
+            self.rainfall_label.text = f"Rainfall: {w.get('rainfall', 'N/A')}"
+            self.wind_speed_label.text = f"Wind Speed: {w.get('wind_speed', 'N/A')} m/s"
+
+        if "team_radio" in self.insights:
+            df_radio = self.filter_insight(f, "team_radio").head(20)
+            radio_data = []
+            for _, row in df_radio.iterrows():
+                driver = self.engine.drivers.get(row["driver_number"], f"#{row['driver_number']}")
+                url = row.get('recording_url', 'No URL')
+                radio_data.append((driver, row['date'], url))
+            self.radio_table.data = radio_data
+            # Add on_activate to open URL
+            self.radio_table.on_activate = self.open_radio_url
+
+    def refresh_track_tab(self, f):
+        import plotly.express as px
+        if not f["session"]:
+            return
         try:
-            response = requests.get(url)
-            if response.status_code == 200:
-                return response.json()
-        except:
-            pass
-        return None
+            # Resolve the session's circuit once; geometry and map come from the local circuit store
+            session_data = self.client.fetch_historical("sessions", params={"session_key": f["session"]})
+            session = session_data[0] if session_data else {}
+            self.circuit_key = session.get("circuit_key")
+            circuit_id = self.circuits.resolve(self.circuit_key)
+            if circuit_id is None:
+                circuit_name = session.get("circuit_short_name")
+                try:
+                    circuit_data = self.client.fetch_historical("circuits", params={"circuit_key": session.get("circuit_key")})
+                    circuit_name = circuit_data[0].get("circuit_name") if circuit_data else circuit_name
+                except Exception as e:
+                    print(f"Circuit lookup error: {e}")
+                circuit_id = self.circuits.resolve(session.get("circuit_key"), circuit_name, session.get("location"))
+            circuit = self.circuits.geometry(circuit_id) if circuit_id else None
+            if circuit is None:
+                self.track_map_view.set_content('about:blank', '<p>No matching circuit geometry</p>')
+                return
+
+            self.track_properties_label.text = (f"Name: {circuit['name']}\nLocation: {circuit['location']}, {circuit['country']}\n"
+                                                f"Length: {circuit['length_m']}m\nAltitude: {circuit['altitude']}m")
+            self.track_map_view.set_content('about:blank', self.circuits.map_html(circuit_id))
+
+            # Elevation (single value; for profile if key set)
+            self.track_elevation_label.text = f"Altitude: {circuit['altitude']}m"
+
+            # Elevation profile: computed once per circuit, then served from disk
+            profile = self.elevation.profile(circuit_id)
+            if profile is not None:
+                fig = px.line(x=profile["distance"], y=profile["elevation"], title=f"Elevation Profile (m, {profile['source']})")
+                self.set_chart("elevation", self.track_elevation_chart, fig, len(profile["distance"]))
+            else:
+                self.track_elevation_chart.set_content('about:blank', '<p>Set GOOGLE_API_KEY, OPENF1_DEM_PATH or OPENF1_ELEVATION_DIR for profile</p>')
+
+            # Turns Table (placeholder)
+            turns_data = []  # Expand if 'turns' property added in future
+            self.track_turns_table.data = turns_data or [("No detailed turns available",)]
+        except Exception as e:
+            print(f"Track refresh error: {e}")
+
+    def refresh_track_positions(self, f):
+        if "track_positions" not in self.insights:
+            return
+        df_pos = self.filter_insight(f, "track_positions").sort_values("distance_m", ascending=False)
+        driver_names = df_pos["driver_number"].map(self.engine.drivers).fillna("#" + df_pos["driver_number"].astype(str))
+        ahead_names = df_pos["car_ahead"].map(self.engine.drivers).fillna("#" + df_pos["car_ahead"].astype(str))
+        columns = [driver_names, df_pos["mini_sector"], df_pos["distance_m"].round(0), ahead_names, df_pos["gap_ahead_m"].round(0), df_pos["gap_ahead_s"].round(2)]
+        self.track_positions_table.data = list(zip(*columns))
+
+    def refresh_lap_telemetry(self, index, driver_num):
+        # Lap-aligned traces vs distance: selected driver (or fastest lap holder) vs comparison driver
+        if driver_num is None:
+            driver_num = self.insights.get("fastest_lap", {}).get("driver_number")
+        if self.telemetry_lap.value == "Full session":
+            self.refresh_session_telemetry(driver_num)
+            return
+        compare_name = self.telemetry_compare.value
+        compare_num = self.engine.driver_numbers.get(compare_name)
+
+        frames = []
+        for num in [driver_num, compare_num]:
+            if num is None:
+                continue
+            lap_number = index.best_lap(num) if self.telemetry_lap.value in (None, "Fastest") else int(self.telemetry_lap.value)
+            lap = index.lap(num, lap_number) if lap_number is not None else None
+            if lap is not None:
+                df = pd.DataFrame(lap)
+                df["driver"] = f"{self.engine.drivers.get(num, f'#{num}')} L{lap_number}"
+                frames.append(df)
+        if not frames:
+            self.telemetry_speed_chart.set_content('about:blank', '<p>No telemetry data</p>')
+            return
+
+        self.plot_telemetry(pd.concat(frames, ignore_index=True), index.mode, color="driver")
+        self.telemetry_stats_label.text = self.chart_stats_text()
+
+    def refresh_session_telemetry(self, driver_num):
+        # Whole-session trace for one driver from the loaded car_data frame; plot_telemetry
+        # reduces it to ~2 points per pixel
+        car_data = self.session_frames.get("v1/car_data")
+        if car_data is None or driver_num is None:
+            self.telemetry_speed_chart.set_content('about:blank', '<p>No telemetry data</p>')
+            return
+        df_tele = self.engine.filter_frame("session_car_data", car_data, [driver_num])
+        if df_tele.empty:
+            self.telemetry_speed_chart.set_content('about:blank', '<p>No telemetry data</p>')
+            return
+        self.plot_telemetry(df_tele, "date")
+        self.telemetry_stats_label.text = self.chart_stats_text()
+
+    def plot_telemetry(self, df_tele, x, color=None):
+        import plotly.express as px
+        n_out = self.chart_points(self.telemetry_speed_chart)
+        for name, widget, ys in [("speed", self.telemetry_speed_chart, ["speed"]),
+                                 ("rpm", self.telemetry_rpm_chart, ["rpm"]),
+                                 ("throttle", self.telemetry_throttle_chart, ["throttle", "brake"])]:
+            df_chart = downsample_frame(df_tele, x, ys, n_out, by=color)
+            if len(ys) == 1:
+                fig = px.line(df_chart, x=x, y=ys[0], color=color, title=name.capitalize())
+            else:
+                fig = px.line(df_chart, x=x, y=ys, line_dash=color, title="Throttle/Brake")
+            self.set_chart(name, widget, fig, len(df_chart))
+
+    def chart_points(self, widget):
+        # Two points (bucket min and max) per horizontal pixel of the target WebView
+        width = getattr(getattr(widget, "layout", None), "content_width", 0) or self.main_window.size[0]
+        return max(int(width) * 2, 200)
+
+    def set_chart(self, name, widget, fig, points):
+        start = time.perf_counter()
+        html = fig.to_html(include_plotlyjs='cdn')
+        serialized = time.perf_counter()
+        widget.set_content('about:blank', html)
+        end = time.perf_counter()
+        metrics.observe("chart_serialize", serialized - start, chart=name)
+        metrics.observe("chart_render", end - serialized, chart=name)
+        metrics.count("chart_html_bytes", len(html), chart=name)
+        self.chart_stats[name] = {"points": points, "render_ms": (end - start) * 1000, "html_bytes": len(html)}
+
+    def chart_stats_text(self):
+        points = sum(s["points"] for s in self.chart_stats.values())
+        render_ms = sum(s["render_ms"] for s in self.chart_stats.values())
+        size_kb = sum(s["html_bytes"] for s in self.chart_stats.values()) / 1024
+        return f"Charts: {points} points, {render_ms:.0f} ms render, {size_kb:.0f} KB HTML"
+
+    def refresh_perf_tab(self, f=None):
+        # Slowest spans first; counters and gauges (cache hits, bytes, queue depths) below
+        snapshot = metrics.snapshot()
+        labels = lambda d: ", ".join(f"{k}={v}" for k, v in d.items())
+        spans = sorted(snapshot["spans"], key=lambda s: s["total_s"], reverse=True)
+        self.perf_spans_table.data = [(s["name"], labels(s["labels"]), s["count"], f"{s['avg_ms']:.1f}", f"{s['p95_ms']:.1f}", f"{s['max_ms']:.1f}", f"{s['total_s']:.2f}")
+                                      for s in spans]
+        values = sorted(snapshot["counters"] + snapshot["gauges"], key=lambda v: (v["name"], labels(v["labels"])))
+        self.perf_values_table.data = [(v["name"], labels(v["labels"]), f"{v['value']:,}") for v in values]
+        profiling = f", profiling: {self.profiler.kind}" if self.profiler.profiler is not None else ""
+        exporting = f", exporting to {self.metrics_exporter.path}" if self.metrics_exporter.path else ""
+        self.perf_label.text = f"Uptime {snapshot['uptime_s']:.0f} s, generation {self.engine.generation}{profiling}{exporting}"
+
+    def reset_perf(self, widget):
+        metrics.reset()
+        self.refresh_perf_tab()
+
+    def shutdown(self, app, **kwargs):
+        self.metrics_exporter.stop()
+        path = self.profiler.stop()
+        if path:
+            print(f"Profile written to {path}")
+        self.client.close()
+        return True
 
     def open_radio_url(self, widget, row, **kwargs):
         url = row.url
@@ -380,13 +583,16 @@ class OpenF1LiveInsights(toga.App):
         return toga.Box(children=[self.laps_table, self.laps_chart, self.fastest_lap_label, self.avg_laps_label], style=Pack(direction=COLUMN, flex=1))
 
     def build_telemetry_tab(self):
+        self.telemetry_lap = toga.Selection(items=["Fastest", "Full session"], on_change=self.filter_data)
+        self.telemetry_compare = toga.Selection(items=["None"], on_change=self.filter_data)
         self.telemetry_speed_chart = toga.WebView(style=Pack(flex=1/3))
         self.telemetry_rpm_chart = toga.WebView(style=Pack(flex=1/3))
         self.telemetry_throttle_chart = toga.WebView(style=Pack(flex=1/3))
-        return toga.Box(children=[self.telemetry_speed_chart, self.telemetry_rpm_chart, self.telemetry_throttle_chart], style=Pack(direction=COLUMN, flex=1))
+        self.telemetry_stats_label = toga.Label("Charts: N/A")
+        return toga.Box(children=[self.telemetry_lap, self.telemetry_compare, self.telemetry_speed_chart, self.telemetry_rpm_chart, self.telemetry_throttle_chart, self.telemetry_stats_label], style=Pack(direction=COLUMN, flex=1))
 
     def build_stints_tab(self):
-        self.stints_table = toga.Table(headings=["Driver", "Start Lap", "End Lap", "Compound", "Age"], data=[], style=Pack(flex=0.5))
+        self.stints_table = toga.Table(headings=["Driver", "Start Lap", "End Lap", "Compound", "Age", "Pace (fuel corr.)", "Deg/Lap"], data=[], style=Pack(flex=0.5))
         self.tyres_table = toga.Table(headings=["Driver", "Compound", "Fresh"], data=[], style=Pack(flex=0.5))
         return toga.Box(children=[self.stints_table, self.tyres_table], style=Pack(direction=COLUMN, flex=1))
 
@@ -411,7 +617,17 @@ class OpenF1LiveInsights(toga.App):
         self.track_map_view = toga.WebView(style=Pack(flex=0.5))
         self.track_elevation_chart = toga.WebView(style=Pack(flex=0.5))
         self.track_turns_table = toga.Table(headings=["Turn", "Details"], data=[], style=Pack(flex=0.3))
-        return toga.Box(children=[self.track_properties_label, self.track_elevation_label, self.track_map_view, self.track_elevation_chart, self.track_turns_table], style=Pack(direction=COLUMN, flex=1))
+        self.track_live_view = toga.WebView(style=Pack(flex=0.5))  # live cars, updated by JS deltas
+        self.track_positions_table = toga.Table(headings=["Driver", "Mini-sector", "Distance (m)", "Car Ahead", "Gap (m)", "Gap (s)"], data=[], style=Pack(flex=0.3))
+        return toga.Box(children=[self.track_properties_label, self.track_elevation_label, self.track_map_view, self.track_live_view, self.track_positions_table, self.track_elevation_chart, self.track_turns_table], style=Pack(direction=COLUMN, flex=1))
+
+    def build_perf_tab(self):
+        self.perf_label = toga.Label("Uptime: N/A")
+        refresh_button = toga.Button("Refresh", on_press=lambda widget: self.refresh_perf_tab())
+        reset_button = toga.Button("Reset", on_press=self.reset_perf)
+        self.perf_spans_table = toga.Table(headings=["Span", "Labels", "Count", "Avg ms", "P95 ms", "Max ms", "Total s"], data=[], style=Pack(flex=0.6))
+        self.perf_values_table = toga.Table(headings=["Metric", "Labels", "Value"], data=[], style=Pack(flex=0.4))
+        return toga.Box(children=[self.perf_label, refresh_button, reset_button, self.perf_spans_table, self.perf_values_table], style=Pack(direction=COLUMN, flex=1))
 
 def main():
     return OpenF1LiveInsights()
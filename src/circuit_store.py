@@ -0,0 +1,218 @@
+import json
+import os
+import threading
+import numpy as np
+import requests
+
+DEFAULT_CIRCUIT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "openf1", "circuits")
+BACINGER_URL = "https://raw.githubusercontent.com/bacinger/f1-circuits/master/"
+SIMPLIFY_TOLERANCE_M = 2.0  # max deviation of the simplified centreline
+EARTH_RADIUS_M = 6371000.0
+
+# OpenF1 circuit names -> bacinger/f1-circuits ids (file names without .geojson)
+CIRCUIT_IDS = {
+    "Albert Park Grand Prix Circuit": "au-1953",
+    "Baku City Circuit": "az-2016",
+    "Circuit de Barcelona-Catalunya": "es-1991",
+    "Autódromo Oscar y Juan Gálvez": "ar-1952",
+    "Hungaroring": "hu-1986",
+    "Watkins Glen": "us-1956",
+    "Autódromo do Estoril": "pt-1972",
+    "Hockenheimring": "de-1932",
+    "Autodromo Enzo e Dino Ferrari": "it-1953",
+    "Indianapolis Motor Speedway": "us-1909",
+    "Istanbul Park": "tr-2005",
+    "Autódromo Internacional Nelson Piquet": "br-1977",
+    "Jeddah Corniche Circuit": "sa-2021",
+    "Kyalami": "za-1961",
+    "Las Vegas Street Circuit": "us-2023",
+    "Circuit Paul Ricard": "fr-1969",
+    "Losail International Circuit": "qa-2004",
+    "Madrid Street Circuit": "es-2026",
+    "Circuit de Nevers Magny-Cours": "fr-1960",
+    "Autódromo Hermanos Rodríguez": "mx-1962",
+    "Miami International Autodrome": "us-2022",
+    "Circuit de Monaco": "mc-1929",
+    "Circuit Gilles Villeneuve": "ca-1978",
+    "Autodromo Nazionale di Monza": "it-1922",
+    "Circuit de Spa-Francorchamps": "be-1924",
+    "Silverstone Circuit": "gb-1948",
+    "Suzuka International Racing Course": "jp-1962",
+    "Red Bull Ring": "at-1969",
+    "Circuit of the Americas": "us-2012",
+    "Bahrain International Circuit": "bh-2004",
+}
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    # Vectorized great-circle distance in metres (degrees in, arrays or scalars)
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def simplify(coords, tolerance_m=SIMPLIFY_TOLERANCE_M):
+    # Ramer-Douglas-Peucker on a local equirectangular projection; coords are (lon, lat)
+    coords = np.asarray(coords, dtype=float)
+    if len(coords) < 3:
+        return coords
+    lat0 = np.radians(coords[:, 1].mean())
+    xy = np.column_stack((np.radians(coords[:, 0]) * np.cos(lat0), np.radians(coords[:, 1]))) * EARTH_RADIUS_M
+    keep = np.zeros(len(xy), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(xy) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        seg = xy[end] - xy[start]
+        pts = xy[start + 1:end] - xy[start]
+        length = np.hypot(*seg)
+        if length == 0:
+            dist = np.hypot(pts[:, 0], pts[:, 1])
+        else:
+            dist = np.abs(seg[0] * pts[:, 1] - seg[1] * pts[:, 0]) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance_m:
+            keep[start + 1 + i] = True
+            stack.append((start, start + 1 + i))
+            stack.append((start + 1 + i, end))
+    return coords[keep]
+
+
+def _line_coords(geometry):
+    if geometry["type"] == "LineString":
+        return geometry["coordinates"]
+    if geometry["type"] == "MultiLineString":
+        return [pt for line in geometry["coordinates"] for pt in line]
+    if geometry["type"] == "Polygon":
+        return geometry["coordinates"][0]
+    return []
+
+
+class CircuitStore:
+    # Offline circuit geometry: bacinger/f1-circuits preparsed into simplified (lon, lat)
+    # arrays plus length/centroid metadata, and one pre-rendered Folium map per circuit.
+    def __init__(self, root_dir=None, http=None):
+        self.root_dir = root_dir or os.getenv("OPENF1_CIRCUIT_DIR") or DEFAULT_CIRCUIT_DIR
+        self.http = http or requests
+        self.lock = threading.Lock()
+        self.index_path = os.path.join(self.root_dir, "index.json")
+        self.geometries = {}  # {circuit_id: geometry dict}, loaded on first use
+        os.makedirs(self.root_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"circuits": {}, "circuit_keys": {}}
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f, indent=1, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def sync(self):
+        # Download every circuit in one file and preparse it; no-op once the store is filled
+        if self.index["circuits"]:
+            return True
+        try:
+            response = self.http.get(f"{BACINGER_URL}f1-circuits.geojson", timeout=30)
+            if response.status_code != 200:
+                return False
+            features = response.json()["features"]
+        except (requests.RequestException, ValueError, KeyError):
+            return False
+        with self.lock:
+            for feature in features:
+                self._add_feature(feature)
+            self._save_index()
+        return True
+
+    def _fetch_one(self, circuit_id):
+        try:
+            response = self.http.get(f"{BACINGER_URL}circuits/{circuit_id}.geojson", timeout=30)
+            if response.status_code != 200:
+                return False
+            features = response.json()["features"]
+        except (requests.RequestException, ValueError, KeyError):
+            return False
+        with self.lock:
+            for feature in features:
+                self._add_feature(feature, circuit_id)
+            self._save_index()
+        return circuit_id in self.index["circuits"]
+
+    def _add_feature(self, feature, circuit_id=None):
+        props = feature.get("properties", {})
+        circuit_id = props.get("id") or circuit_id
+        coords = np.asarray(_line_coords(feature.get("geometry") or {}), dtype=float)[:, :2] if feature.get("geometry") else np.zeros((0, 2))
+        if not circuit_id or len(coords) < 2:
+            return
+        length_m = float(haversine_m(coords[:-1, 1], coords[:-1, 0], coords[1:, 1], coords[1:, 0]).sum())
+        simplified = simplify(coords)
+        np.save(os.path.join(self.root_dir, f"{circuit_id}.npy"), simplified)
+        self.index["circuits"][circuit_id] = {
+            "name": props.get("Name") or props.get("name") or circuit_id,
+            "location": props.get("Location") or props.get("location") or "",
+            "country": circuit_id.split("-")[0].upper(),
+            "altitude": props.get("altitude"),
+            "length_m": props.get("length") or round(length_m),
+            "centreline_m": round(length_m),
+            "centroid": [float(coords[:, 1].mean()), float(coords[:, 0].mean())],  # lat, lon
+            "bounds": [float(coords[:, 1].min()), float(coords[:, 0].min()), float(coords[:, 1].max()), float(coords[:, 0].max())],
+            "points": len(simplified),
+        }
+
+    def resolve(self, circuit_key=None, circuit_name=None, location=None):
+        # circuit_key -> bacinger id; remembered in the index after the first match
+        key = str(circuit_key) if circuit_key is not None else None
+        if key and key in self.index["circuit_keys"]:
+            return self.index["circuit_keys"][key]
+        circuit_id = CIRCUIT_IDS.get(circuit_name)
+        if circuit_id is None and location:
+            self.sync()
+            wanted = location.strip().lower()
+            circuit_id = next((cid for cid, meta in self.index["circuits"].items() if meta["location"].lower() == wanted), None)
+        if circuit_id and key:
+            with self.lock:
+                self.index["circuit_keys"][key] = circuit_id
+                self._save_index()
+        return circuit_id
+
+    def geometry(self, circuit_id):
+        # {"id", "coords": (N, 2) lon/lat array, **metadata} or None when unavailable offline
+        if circuit_id in self.geometries:
+            return self.geometries[circuit_id]
+        if circuit_id not in self.index["circuits"] and not (self.sync() and circuit_id in self.index["circuits"]):
+            if not self._fetch_one(circuit_id):
+                return None
+        path = os.path.join(self.root_dir, f"{circuit_id}.npy")
+        if not os.path.exists(path):
+            return None
+        geometry = {"id": circuit_id, "coords": np.load(path), **self.index["circuits"][circuit_id]}
+        self.geometries[circuit_id] = geometry
+        return geometry
+
+    def map_html(self, circuit_id):
+        # Folium map rendered once per circuit and reused from disk afterwards
+        path = os.path.join(self.root_dir, f"{circuit_id}.html")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        geometry = self.geometry(circuit_id)
+        if geometry is None:
+            return None
+        import folium  # only needed the first time a circuit is shown
+        lat, lon = geometry["centroid"]
+        m = folium.Map(location=[lat, lon], zoom_start=14)
+        folium.PolyLine([(pt[1], pt[0]) for pt in geometry["coords"]], weight=4, tooltip=geometry["name"]).add_to(m)
+        south, west, north, east = geometry["bounds"]
+        m.fit_bounds([[south, west], [north, east]])
+        html = m._repr_html_()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+        return html
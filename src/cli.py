@@ -0,0 +1,163 @@
+# Headless pipeline: fetch -> InsightsEngine -> export, without toga or any charting.
+#
+#     python -m src.cli historical 9161 --out insights/ --format parquet
+#     python -m src.cli live --out live/ --interval 5 --seconds 3600
+#     python -m src.cli season --year 2025 --out season/ --format csv
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import pandas as pd
+from .api_client import OpenF1Client, SESSION_ENDPOINTS
+from .insights_engine import InsightsEngine
+from .instrumentation import MetricsExporter, Profiler
+
+FORMATS = ["json", "parquet", "csv"]
+
+
+def _parquet_safe(df):
+    # Mixed-type object columns (e.g. gap_to_leader: float or "+1 LAP") as text; nulls stay null
+    columns = {col: df[col].astype(str).where(df[col].notna(), None) for col in df.columns if df[col].dtype == object}
+    return df.assign(**columns) if columns else df
+
+
+def write_frame(df, path, fmt):
+    if fmt == "parquet":
+        _parquet_safe(df).to_parquet(path, index=False)
+    elif fmt == "csv":
+        df.to_csv(path, index=False)
+    else:
+        df.to_json(path, orient="records", date_format="iso")
+
+
+def export_insights(insights, out_dir, fmt="json"):
+    # One file per DataFrame insight, everything JSON-serializable in summary.json.
+    # Files are replaced atomically so a reader never sees a half-written export.
+    os.makedirs(out_dir, exist_ok=True)
+    summary = {}
+    written = []
+    for key, value in insights.items():
+        if key == "versions":
+            continue  # UI refresh bookkeeping
+        if isinstance(value, pd.DataFrame):
+            path = os.path.join(out_dir, f"{key}.{fmt}")
+            write_frame(value, f"{path}.tmp", fmt)
+            os.replace(f"{path}.tmp", path)
+            written.append(path)
+        elif isinstance(value, (dict, list, str, int, float)) or value is None:
+            summary[key] = value
+    path = os.path.join(out_dir, "summary.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(summary, f, indent=1, default=str)
+    os.replace(f"{path}.tmp", path)
+    written.append(path)
+    return written
+
+
+def run_historical(args):
+    client = OpenF1Client()
+    engine = InsightsEngine()
+    try:
+        engine.load_drivers(client, args.session_key)
+        data_queues = engine.load_session(client, args.session_key, endpoints=args.endpoints)
+        insights = engine.generate_insights(data_queues, mode="historical")
+        insights["drivers"] = {num: {"name": name, "team": engine.teams.get(num)} for num, name in engine.drivers.items()}
+        if args.raw:
+            insights.update({f"raw_{topic.split('/')[-1]}": df for topic, df in data_queues.items()})
+        written = export_insights(insights, args.out, args.format)
+    finally:
+        client.close()
+    print(f"Wrote {len(written)} files to {args.out}")
+
+
+async def tail_live(args):
+    client = OpenF1Client()
+    engine = InsightsEngine(incremental=True)
+    client.message_handlers.append(engine.apply_message)
+    if args.session_key:
+        engine.load_drivers(client, args.session_key)
+    stream = await client.start_mqtt_stream()
+    deadline = time.monotonic() + args.seconds if args.seconds else None
+    exports = 0
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            started = time.monotonic()
+            if await stream.wait_for_update(timeout=args.interval):
+                insights = engine.generate_insights(None, mode="live")
+                export_insights(insights, args.out, args.format)
+                exports += 1
+            await asyncio.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+    finally:
+        client.close()
+    print(f"Exported {exports} snapshots to {args.out}")
+
+
+def run_season(args):
+    from .multi_session import MultiSessionEngine
+    client = OpenF1Client()
+    try:
+        engine = MultiSessionEngine(client, max_workers=args.workers)
+        sessions = engine.sessions(session_keys=args.session_keys, year=args.year, meeting_key=args.meeting_key, session_name=args.session_name)
+        aggregates = engine.aggregate(sessions)
+        insights = {"sessions": sessions, **aggregates,
+                    "driver_pace": engine.driver_pace(aggregates).reset_index(),
+                    "stint_lengths": engine.stint_lengths(aggregates)}
+        written = export_insights(insights, args.out, args.format)
+    finally:
+        client.close()
+    print(f"Aggregated {len(sessions)} sessions into {len(written)} files in {args.out}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m src.cli", description="Run the OpenF1 insights pipeline without the app")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    historical = commands.add_parser("historical", help="insights for a finished session")
+    historical.add_argument("session_key")
+    historical.add_argument("--endpoints", type=lambda s: s.split(","), default=SESSION_ENDPOINTS, help="comma separated, default: all")
+    historical.add_argument("--raw", action="store_true", help="also export the typed source data")
+
+    live = commands.add_parser("live", help="tail the live stream and export snapshots")
+    live.add_argument("--session-key", help="resolve driver names (optional)")
+    live.add_argument("--interval", type=float, default=5.0, help="seconds between exports")
+    live.add_argument("--seconds", type=float, default=None, help="stop after this long (default: until Ctrl+C)")
+
+    season = commands.add_parser("season", help="multi-session aggregates")
+    season.add_argument("--year", type=int)
+    season.add_argument("--meeting-key", type=int)
+    season.add_argument("--session-keys", type=lambda s: s.split(","))
+    season.add_argument("--session-name", default="Race")
+    season.add_argument("--workers", type=int, default=None)
+
+    for command in (historical, live, season):
+        command.add_argument("--out", default="insights", help="output directory")
+        command.add_argument("--format", choices=FORMATS, default="json")
+    args = parser.parse_args(argv)
+    if args.command == "season" and not (args.year or args.meeting_key or args.session_keys):
+        parser.error("season needs --year, --meeting-key or --session-keys")
+
+    # OPENF1_METRICS_FILE / OPENF1_PROFILE apply headless too
+    profiler = Profiler().start()
+    exporter = MetricsExporter().start()
+    try:
+        if args.command == "historical":
+            run_historical(args)
+        elif args.command == "season":
+            run_season(args)
+        else:
+            try:
+                asyncio.run(tail_live(args))
+            except KeyboardInterrupt:
+                pass
+    finally:
+        exporter.stop()
+        path = profiler.stop()
+        if path:
+            print(f"Profile written to {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+# Chart series are reduced to about two points per horizontal pixel before they are
+# handed to Plotly: the min and max of each bucket, so speed peaks and braking spikes survive.
+
+
+def minmax(y, n_out):
+    # Indices of the min and max sample in each of n_out / 2 equal-count buckets
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= n_out or n_out < 4:
+        return np.arange(n)
+    size = int(np.ceil(n / (n_out // 2)))
+    buckets = int(np.ceil(n / size))
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lo = offsets + np.argmin(np.where(np.isnan(padded), np.inf, padded), axis=1)
+    hi = offsets + np.argmax(np.where(np.isnan(padded), -np.inf, padded), axis=1)
+    idx = np.unique(np.concatenate(([0, n - 1], lo, hi)))
+    return idx[idx < n]
+
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keeps the visual shape of smooth series (lap times)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=int)
+    idx[0], idx[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        nxt_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:nxt_end].mean() if nxt_end > end else x[-1]
+        avg_y = y[end:nxt_end].mean() if nxt_end > end else y[-1]
+        area = np.abs((x[prev] - avg_x) * (y[start:end] - y[prev]) - (x[prev] - x[start:end]) * (avg_y - y[prev]))
+        prev = start + int(np.nanargmax(area)) if len(area) and not np.all(np.isnan(area)) else start
+        idx[i + 1] = prev
+    return np.unique(idx)
+
+
+def downsample_frame(df, x, ys, n_out, by=None, method="minmax"):
+    # Rows to keep so that each series (one per `by` group) has about n_out points
+    if df.empty:
+        return df
+    ys = [ys] if isinstance(ys, str) else list(ys)
+    groups = [df] if by is None else [g for _, g in df.groupby(by, sort=False, observed=True)]
+    kept = []
+    for group in groups:
+        if len(group) <= n_out:
+            kept.append(group)
+            continue
+        xs = group[x]
+        if pd.api.types.is_datetime64_any_dtype(xs):
+            xs = xs.astype("int64")
+        xs = xs.to_numpy(dtype=float)
+        idx = np.unique(np.concatenate([
+            lttb(xs, group[y].to_numpy(dtype=float), n_out) if method == "lttb" else minmax(group[y].to_numpy(dtype=float), n_out)
+            for y in ys
+        ]))
+        kept.append(group.iloc[idx])
+    return pd.concat(kept) if len(kept) > 1 else kept[0]
@@ -0,0 +1,102 @@
+import csv
+import os
+import numpy as np
+from .circuit_store import haversine_m
+
+ELEVATION_SAMPLES = 200
+GOOGLE_BATCH = 512  # locations per Elevation API request
+
+
+def resample_path(coords, samples=ELEVATION_SAMPLES):
+    # Equidistant points along a (lon, lat) polyline -> (distances_m, lats, lons)
+    coords = np.asarray(coords, dtype=float)
+    steps = haversine_m(coords[:-1, 1], coords[:-1, 0], coords[1:, 1], coords[1:, 0])
+    cumulative = np.concatenate(([0.0], np.cumsum(steps)))
+    distances = np.linspace(0.0, cumulative[-1], samples)
+    lats = np.interp(distances, cumulative, coords[:, 1])
+    lons = np.interp(distances, cumulative, coords[:, 0])
+    return distances, lats, lons
+
+
+class ElevationService:
+    # Elevation profile per circuit, computed once and persisted next to the circuit store.
+    # Sources, in order: persisted profile, precomputed file, local DEM, Google Elevation API.
+    def __init__(self, circuits, dem_path=None, profile_dir=None, api_key=None):
+        self.circuits = circuits
+        self.dem_path = dem_path or os.getenv("OPENF1_DEM_PATH")
+        self.profile_dir = profile_dir or os.getenv("OPENF1_ELEVATION_DIR")
+        self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        self.profiles = {}  # {circuit_id: profile}
+
+    def _cache_path(self, circuit_id):
+        return os.path.join(self.circuits.root_dir, f"{circuit_id}.elevation.npz")
+
+    def profile(self, circuit_id, samples=ELEVATION_SAMPLES):
+        # {"distance": m array, "elevation": m array, "source": str} or None if no source is available
+        if circuit_id in self.profiles:
+            return self.profiles[circuit_id]
+        path = self._cache_path(circuit_id)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                profile = {"distance": data["distance"], "elevation": data["elevation"], "source": str(data["source"])}
+            self.profiles[circuit_id] = profile
+            return profile
+
+        profile = self._from_file(circuit_id)
+        if profile is None:
+            geometry = self.circuits.geometry(circuit_id)
+            if geometry is None:
+                return None
+            distances, lats, lons = resample_path(geometry["coords"], samples)
+            for source, sampler in (("dem", self._sample_dem), ("google", self._sample_google)):
+                elevations = sampler(lats, lons)
+                if elevations is not None:
+                    profile = {"distance": distances, "elevation": np.asarray(elevations, dtype=float), "source": source}
+                    break
+        if profile is None:
+            return None
+        np.savez(path, distance=profile["distance"], elevation=profile["elevation"], source=profile["source"])
+        self.profiles[circuit_id] = profile
+        return profile
+
+    def _from_file(self, circuit_id):
+        # Precomputed "<circuit_id>.csv" with distance,elevation columns (metres)
+        if not self.profile_dir:
+            return None
+        path = os.path.join(self.profile_dir, f"{circuit_id}.csv")
+        if not os.path.exists(path):
+            return None
+        with open(path, newline="") as f:
+            rows = [(float(r["distance"]), float(r["elevation"])) for r in csv.DictReader(f)]
+        if not rows:
+            return None
+        data = np.array(rows)
+        return {"distance": data[:, 0], "elevation": data[:, 1], "source": "file"}
+
+    def _sample_dem(self, lats, lons):
+        if not self.dem_path or not os.path.exists(self.dem_path):
+            return None
+        try:
+            import rasterio  # optional: sample a local DEM/GeoTIFF; only loaded when one is configured
+        except ImportError:
+            return None
+        with rasterio.open(self.dem_path) as dem:
+            xs, ys = lons, lats
+            if dem.crs and dem.crs.to_epsg() != 4326:
+                from rasterio.warp import transform
+                xs, ys = transform("EPSG:4326", dem.crs, lons, lats)
+            values = np.array([v[0] for v in dem.sample(zip(xs, ys))], dtype=float)
+            if dem.nodata is not None:
+                values[values == dem.nodata] = np.nan
+        return None if np.all(np.isnan(values)) else values
+
+    def _sample_google(self, lats, lons):
+        if not self.api_key:
+            return None
+        import googlemaps  # only needed when no offline source exists
+        gmaps = googlemaps.Client(key=self.api_key)
+        locations = list(zip(lats.tolist(), lons.tolist()))
+        elevations = []
+        for i in range(0, len(locations), GOOGLE_BATCH):
+            elevations.extend(r["elevation"] for r in gmaps.elevation(locations[i:i + GOOGLE_BATCH]))
+        return elevations
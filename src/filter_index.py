@@ -0,0 +1,29 @@
+import numpy as np
+
+
+class FrameIndex:
+    # driver_number -> row positions of one insight frame, built once per frame.
+    # Frames from the session store are clustered by driver, so a single driver is
+    # usually one contiguous block and selecting it is a zero-copy iloc slice.
+    def __init__(self, df, col="driver_number"):
+        self.df = df
+        self.groups = {}  # {driver_number: slice or position array}
+        if col not in df.columns:
+            return
+        for key, positions in df.groupby(col, sort=False, observed=True).indices.items():
+            key = int(key)
+            if positions[-1] - positions[0] + 1 == len(positions) and np.all(np.diff(positions) == 1):
+                self.groups[key] = slice(int(positions[0]), int(positions[-1]) + 1)
+            else:
+                self.groups[key] = positions
+
+    def select(self, drivers):
+        if drivers is None:
+            return self.df
+        parts = [self.groups[d] for d in drivers if d in self.groups]
+        if not parts:
+            return self.df.iloc[0:0]
+        if len(parts) == 1:
+            return self.df.iloc[parts[0]]
+        positions = np.sort(np.concatenate([np.arange(p.start, p.stop) if isinstance(p, slice) else p for p in parts]))
+        return self.df.iloc[positions]
@@ -1,9 +1,58 @@
 import pandas as pd
+from .api_client import SESSION_ENDPOINTS, CHUNKED_ENDPOINTS, CHUNK_WINDOW
+from .session_store import SessionStore, to_frame
+from .live_state import LiveState
+from . import lap_analytics
+from .telemetry_index import TelemetryIndex
+from .filter_index import FrameIndex
+from .session_timeline import SessionTimeline, CHECKPOINT_INTERVAL
+from .instrumentation import metrics
+
+# Source topics behind each insight, so the UI can tell which tabs changed
+INSIGHT_SOURCES = {
+    "standings": ["v1/position", "v1/intervals", "v1/stints"],
+    "laps": ["v1/laps"],
+    "fastest_lap": ["v1/laps"],
+    "average_lap_times": ["v1/laps"],
+    "best_laps": ["v1/laps"],
+    "telemetry": ["v1/car_data"],
+    "telemetry_index": ["v1/car_data", "v1/laps"],
+    "stints": ["v1/stints"],
+    "tyres": ["v1/tyres"],
+    "pits": ["v1/pit"],
+    "pit_counts": ["v1/pit"],
+    "recent_pits": ["v1/pit"],
+    "race_events": ["v1/race_control"],
+    "weather": ["v1/weather"],
+    "team_radio": ["v1/team_radio"],
+    "stint_analysis": ["v1/laps", "v1/stints", "v1/pit"],
+    "sector_deltas": ["v1/laps"],
+    "sector_best": ["v1/laps"],
+    "undercuts": ["v1/laps", "v1/pit"],
+    "locations": ["v1/location"],
+    "speeds": ["v1/car_data"],
+    "track_positions": ["v1/location"],
+}
+
+# Historical insights that describe the whole session; kept as-is while scrubbing the timeline
+SESSION_WIDE_INSIGHTS = ["telemetry_index"]
 
 class InsightsEngine:
-    def __init__(self):
+    def __init__(self, store=None, incremental=False):
         self.drivers = {}  # {driver_number: full_name}
         self.teams = {}    # {driver_number: team_name}
+        self.driver_numbers = {}  # {full_name: driver_number}
+        self.team_drivers = {}    # {team_name: [driver_number, ...]}
+        self._frame_indexes = {}  # {insight key: FrameIndex of the frame last filtered}
+        self.store = store or SessionStore()
+        self.incremental = incremental  # live insights from running state instead of raw queues
+        self.live_state = LiveState()
+        self._telemetry_index = None  # (source frames, mode, step, TelemetryIndex)
+        self._sources = {}          # {topic: data object last passed to generate_insights}
+        self._source_versions = {}  # {topic: times that object changed}
+        self.generation = 0
+        self.track_tracker = None  # PositionTracker once a reference lap is available
+        self.timeline = None  # SessionTimeline of the loaded historical session
 
     def load_drivers(self, client, session_key):
         params = {"session_key": session_key}
@@ -12,10 +61,144 @@ class InsightsEngine:
             num = driver["driver_number"]
             self.drivers[num] = driver.get("full_name", f"Driver {num}")
             self.teams[num] = driver.get("team_name", "Unknown")
+        self.driver_numbers = {name: num for num, name in self.drivers.items()}
+        self.team_drivers = {}
+        for num, team in self.teams.items():
+            self.team_drivers.setdefault(team, []).append(num)
+
+    def load_session(self, client, session_key, endpoints=None, columns=None, drivers=None, laps=None):
+        # Fetch only endpoints not yet in the columnar store, then read back the requested slice.
+        # Sessions still running (or within FINISHED_GRACE) are fetched fresh and never persisted.
+        endpoints = endpoints or SESSION_ENDPOINTS
+        if not client.session_finished(session_key):
+            fetched = client.fetch_session(session_key, endpoints)
+            return {topic: self.select_frame(to_frame(records), columns, drivers, laps) for topic, records in fetched.items()}
+        missing = self.store.missing(session_key, endpoints)
+        streamed = [ep for ep in missing if ep in CHUNKED_ENDPOINTS]
+        bulk = [ep for ep in missing if ep not in CHUNKED_ENDPOINTS]
+        if bulk:
+            self.store.write_session(session_key, client.fetch_session(session_key, bulk))
+        for endpoint in streamed:
+            for _ in self.stream_session(client, session_key, endpoint):
+                pass
+        return self.store.read_session(session_key, endpoints, columns=columns, drivers=drivers, laps=laps)
+
+    def stream_session(self, client, session_key, endpoint, window=CHUNK_WINDOW, per_driver=False):
+        # Yields typed frames window by window, persisting them to the store once the session has finished
+        drivers = list(self.drivers) if per_driver else None
+        chunks = client.iter_chunks(endpoint, session_key, window=window, drivers=drivers)
+        if client.session_finished(session_key):
+            yield from self.store.write_chunks(session_key, endpoint, chunks)
+        else:
+            yield from (to_frame(records) for records in chunks if len(records))
+
+    @staticmethod
+    def select_frame(df, columns=None, drivers=None, laps=None):
+        # In-memory equivalent of the store's column and driver/lap pushdown
+        if drivers is not None and "driver_number" in df.columns:
+            df = df[df["driver_number"].isin([int(d) for d in drivers])]
+        if laps is not None and "lap_number" in df.columns:
+            df = df[df["lap_number"].between(*laps)]
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df.reset_index(drop=True)
+
+    def apply_message(self, topic, payload):
+        # Called per MQTT message (from the paho thread) in incremental mode
+        if self.incremental:
+            self.live_state.apply(topic, payload)
 
     def generate_insights(self, data_queues, mode="live"):
+        with metrics.span("generate_insights", mode=mode):
+            return self._generate_insights(data_queues, mode)
+
+    def _generate_insights(self, data_queues, mode):
+        self.generation += 1
+        if mode == "live" and self.incremental:
+            with metrics.span("insight", insight="live_snapshot"):
+                insights = self.live_state.snapshot()
+            if self.track_tracker is not None and insights["locations"]:
+                with metrics.span("insight", insight="track_positions"):
+                    insights["track_positions"] = self.track_tracker.update(insights["locations"], insights["speeds"])
+            insights["versions"] = self.insight_versions(insights, insights.pop("topic_versions"))
+            return insights
+
         insights = {}
 
         # (Unchanged -full code as in previous version)
 
+        if mode == "historical":
+            with metrics.span("insight", insight="lap_analytics"):
+                insights.update(self.lap_analytics(data_queues))
+            if len(data_queues.get("v1/car_data", [])) and len(data_queues.get("v1/laps", [])):
+                with metrics.span("insight", insight="telemetry_index"):
+                    insights["telemetry_index"] = self.telemetry_index(data_queues)
+
+        insights["versions"] = self.insight_versions(insights, self.track_sources(data_queues))
         return insights
+
+    def build_timeline(self, data_queues, interval=CHECKPOINT_INTERVAL):
+        # Once per loaded historical session; makes insights_at() a checkpoint lookup plus a short replay.
+        # Safe to run in an executor: engine state is untouched, the caller assigns self.timeline
+        # once it has checked the build still belongs to the loaded session.
+        with metrics.span("timeline_build"):
+            return SessionTimeline.build(data_queues, interval)
+
+    def insights_at(self, timestamp):
+        # Live-shaped insights (standings, stints, weather, ...) as they stood at `timestamp` (epoch ns)
+        with metrics.span("timeline_seek"):
+            self.generation += 1
+            insights = self.timeline.snapshot(timestamp)
+            if self.track_tracker is not None and insights["locations"]:
+                insights["track_positions"] = self.track_tracker.update(insights["locations"], insights["speeds"])
+            insights["versions"] = self.insight_versions(insights, insights.pop("topic_versions"))
+            return insights
+
+    def filter_frame(self, key, df, drivers=None):
+        # Rows of insight `key` for the given driver numbers, via a per-frame group index
+        if drivers is None:
+            return df
+        index = self._frame_indexes.get(key)
+        if index is None or index.df is not df:
+            index = self._frame_indexes[key] = FrameIndex(df)
+        return index.select(drivers)
+
+    def track_sources(self, data_queues):
+        # A topic's version bumps whenever a different data object is passed in for it
+        for topic, data in (data_queues or {}).items():
+            if self._sources.get(topic) is not data:
+                self._sources[topic] = data
+                self._source_versions[topic] = self._source_versions.get(topic, 0) + 1
+        return self._source_versions
+
+    def insight_versions(self, insights, topic_versions):
+        versions = {}
+        for key in insights:
+            sources = INSIGHT_SOURCES.get(key)
+            versions[key] = tuple(topic_versions.get(t, 0) for t in sources) if sources else ("generation", self.generation)
+        return versions
+
+    def telemetry_index(self, data_queues, mode="distance", step=None):
+        # Built once per (car_data, laps) pair and reused across refreshes
+        car_data, laps = data_queues["v1/car_data"], data_queues["v1/laps"]
+        cached = self._telemetry_index
+        if cached and cached[0][0] is car_data and cached[0][1] is laps and cached[1:3] == (mode, step):
+            return cached[3]
+        index = TelemetryIndex.build(car_data, laps, mode=mode, step=step)
+        self._telemetry_index = ((car_data, laps), mode, step, index)
+        return index
+
+    def lap_analytics(self, data_queues):
+        # Vectorized stint/sector/undercut analysis over the whole session
+        laps = pd.DataFrame(data_queues.get("v1/laps", []))
+        stints = pd.DataFrame(data_queues.get("v1/stints", []))
+        pits = pd.DataFrame(data_queues.get("v1/pit", []))
+        results = {}
+        if laps.empty:
+            return results
+        if not stints.empty:
+            results["stint_analysis"] = lap_analytics.stint_analysis(laps, stints, pits)
+        results["sector_deltas"], results["sector_best"] = lap_analytics.sector_deltas(laps)
+        if not pits.empty:
+            results["undercuts"] = lap_analytics.undercuts(laps, pits)
+        return results
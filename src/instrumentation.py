@@ -0,0 +1,238 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+RECENT_SAMPLES = 256     # durations kept per span for percentiles
+EXPORT_INTERVAL = 10.0   # seconds between metrics file rewrites
+PROMETHEUS_PREFIX = "openf1"
+
+
+def _metric_name(name):
+    # Prometheus metric names: [a-zA-Z_:][a-zA-Z0-9_:]*
+    name = re.sub(r"[^a-zA-Z0-9_:]", "_", name)
+    return name if re.match(r"[a-zA-Z_:]", name) else f"_{name}"
+
+
+def _label_name(name):
+    name = re.sub(r"[^a-zA-Z0-9_]", "_", str(name))
+    return name if re.match(r"[a-zA-Z_]", name) else f"_{name}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class SpanStats:
+    __slots__ = ("count", "total", "max", "last", "recent")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.last = seconds
+        self.recent.append(seconds)
+        if seconds > self.max:
+            self.max = seconds
+
+    def summary(self):
+        recent = sorted(self.recent)
+        p95 = recent[min(len(recent) - 1, int(len(recent) * 0.95))] if recent else 0.0
+        return {"count": self.count, "total_s": self.total, "avg_ms": self.total / self.count * 1000 if self.count else 0.0,
+                "p95_ms": p95 * 1000, "max_ms": self.max * 1000, "last_ms": self.last * 1000}
+
+
+class Metrics:
+    # Process-wide timing spans, counters and gauges. Recording is a perf_counter pair plus
+    # a dict update, cheap enough for per-refresh and per-request paths; per-message state
+    # (buffer depths, totals) is polled by gauge sources instead. Keys are (name, sorted labels).
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = os.getenv("OPENF1_METRICS", "1") != "0"
+        self.spans = {}     # {key: SpanStats}
+        self.counters = {}  # {key: float}
+        self.gauges = {}    # {key: float}
+        self.gauge_sources = {}  # {owner: callable returning [(name, labels, value), ...]}, polled at snapshot time
+        self.started = time.time()
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+    @contextmanager
+    def span(self, name, **labels):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self.lock:
+            stats = self.spans.get(key)
+            if stats is None:
+                stats = self.spans[key] = SpanStats()
+            stats.add(seconds)
+
+    def count(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self.lock:
+            self.gauges[key] = value
+
+    def register_gauges(self, owner, source):
+        # Re-registering an owner replaces its source (e.g. a new client after reconnecting)
+        self.gauge_sources[owner] = source
+
+    def reset(self):
+        with self.lock:
+            self.spans.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def snapshot(self):
+        sources = list(self.gauge_sources.values()) if self.enabled else []
+        for source in sources:
+            try:
+                for name, labels, value in source():
+                    self.gauge(name, value, **labels)
+            except Exception as e:
+                print(f"Metrics gauge error: {e}")
+        with self.lock:
+            return {
+                "time": time.time(),
+                "uptime_s": time.time() - self.started,
+                "spans": [{"name": name, "labels": dict(labels), **stats.summary()} for (name, labels), stats in self.spans.items()],
+                "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in self.counters.items()],
+                "gauges": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in self.gauges.items()],
+            }
+
+    def prometheus_text(self, snapshot=None):
+        # Text exposition format: one "# TYPE" line per family followed by its samples
+        snapshot = snapshot or self.snapshot()
+        families = {}  # {family: (type, [sample lines])}, insertion ordered
+
+        def add(family, kind, suffix, labels, value):
+            family = _metric_name(f"{PROMETHEUS_PREFIX}_{family}")
+            label_text = ",".join(f'{_label_name(k)}="{_escape(v)}"' for k, v in sorted(labels.items()))
+            families.setdefault(family, (kind, []))[1].append(f"{family}{suffix}{{{label_text}}} {value}" if labels else f"{family}{suffix} {value}")
+
+        for span in snapshot["spans"]:
+            add(f"{span['name']}_seconds", "summary", "_count", span["labels"], span["count"])
+            add(f"{span['name']}_seconds", "summary", "_sum", span["labels"], f"{span['total_s']:.6f}")
+            add(f"{span['name']}_seconds_max", "gauge", "", span["labels"], f"{span['max_ms'] / 1000:.6f}")
+        for counter in snapshot["counters"]:
+            add(f"{counter['name']}_total", "counter", "", counter["labels"], counter["value"])
+        for gauge in snapshot["gauges"]:
+            add(gauge["name"], "gauge", "", gauge["labels"], gauge["value"])
+        lines = []
+        for family, (kind, samples) in families.items():
+            lines.append(f"# TYPE {family} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        # .prom/.txt -> Prometheus text format, anything else -> JSON; replaced atomically
+        snapshot = self.snapshot()
+        text = self.prometheus_text(snapshot) if path.endswith((".prom", ".txt")) else json.dumps(snapshot, indent=1, default=str)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+metrics = Metrics()
+
+
+class MetricsExporter:
+    # Rewrites OPENF1_METRICS_FILE every EXPORT_INTERVAL seconds from a daemon thread
+    def __init__(self, path=None, interval=EXPORT_INTERVAL, registry=None):
+        self.path = path or os.getenv("OPENF1_METRICS_FILE")
+        self.interval = interval
+        self.registry = registry or metrics
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if not self.path or self.thread is not None:
+            return self
+        self.thread = threading.Thread(target=self._run, name="metrics-export", daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.export()
+
+    def export(self):
+        try:
+            self.registry.export(self.path)
+        except OSError as e:
+            print(f"Metrics export error: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        if self.path:
+            self.export()
+
+
+class Profiler:
+    # Optional whole-process capture, switched on with OPENF1_PROFILE=cprofile|pyinstrument;
+    # written to OPENF1_PROFILE_OUT (default openf1-profile.prof / .html) on stop().
+    def __init__(self, kind=None, out_path=None):
+        self.kind = (kind or os.getenv("OPENF1_PROFILE") or "").lower()
+        self.out_path = out_path or os.getenv("OPENF1_PROFILE_OUT")
+        self.profiler = None
+
+    def start(self):
+        if self.kind == "cprofile":
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.kind == "pyinstrument":
+            try:
+                from pyinstrument import Profiler as Pyinstrument
+            except ImportError:
+                print("OPENF1_PROFILE=pyinstrument needs `pip install pyinstrument`")
+                return self
+            self.profiler = Pyinstrument(async_mode="enabled")
+            self.profiler.start()
+        return self
+
+    def stop(self):
+        if self.profiler is None:
+            return None
+        if self.kind == "cprofile":
+            self.profiler.disable()
+            path = self.out_path or "openf1-profile.prof"
+            self.profiler.dump_stats(path)
+        else:
+            self.profiler.stop()
+            path = self.out_path or "openf1-profile.html"
+            with open(path, "w") as f:
+                f.write(self.profiler.output_html())
+        self.profiler = None
+        return path
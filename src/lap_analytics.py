@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+# Lap time gained per lap of fuel burned (~1.6 kg/lap at ~0.035 s/kg)
+FUEL_SECONDS_PER_LAP = 0.055
+OUTLIER_RATIO = 1.07     # laps slower than 107% of the stint median are ignored (SC, traffic)
+DEFAULT_PIT_LOSS = 22.0  # seconds, used when the session has no pit durations
+UNDERCUT_WINDOW = 5      # laps a rival has to respond to a stop
+SECTORS = ["duration_sector_1", "duration_sector_2", "duration_sector_3"]
+
+# All functions are whole-array: no per-driver or per-lap Python loops.
+
+
+def _frame(data):
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    if "driver_number" in df.columns:
+        df = df.assign(driver_number=df["driver_number"].astype("int64"))
+    return df
+
+
+def assign_stints(laps, stints):
+    # Index into `stints` (sorted by driver, lap_start) for every lap, -1 when uncovered
+    lap_keys = laps["driver_number"].to_numpy() * 1000 + laps["lap_number"].to_numpy()
+    stint_keys = stints["driver_number"].to_numpy() * 1000 + stints["lap_start"].to_numpy()
+    idx = np.searchsorted(stint_keys, lap_keys, side="right") - 1
+    valid = idx >= 0
+    safe = np.where(valid, idx, 0)
+    lap_end = stints["lap_end"].fillna(np.inf).to_numpy(dtype=float)
+    valid &= stints["driver_number"].to_numpy()[safe] == laps["driver_number"].to_numpy()
+    valid &= laps["lap_number"].to_numpy() <= lap_end[safe]
+    return np.where(valid, idx, -1)
+
+
+def stint_analysis(laps, stints, pits=None):
+    # Fuel-corrected pace and tyre degradation slope per stint, fitted with closed-form
+    # least squares over all stints at once (np.bincount sums per stint).
+    laps, stints = _frame(laps), _frame(stints)
+    if laps.empty or stints.empty:
+        return pd.DataFrame()
+    stints = stints.sort_values(["driver_number", "lap_start"], ignore_index=True)
+    laps = laps.dropna(subset=["lap_duration"])
+    n_stints = len(stints)
+
+    idx = assign_stints(laps, stints)
+    covered = idx >= 0
+    idx = idx[covered]
+    lap_number = laps["lap_number"].to_numpy(dtype=float)[covered]
+    duration = laps["lap_duration"].to_numpy(dtype=float)[covered]
+    if "is_pit_out_lap" in laps.columns:
+        keep = ~laps["is_pit_out_lap"].fillna(False).to_numpy(dtype=bool)[covered]
+        idx, lap_number, duration = idx[keep], lap_number[keep], duration[keep]
+
+    total_laps = laps["lap_number"].max()
+    corrected = duration - FUEL_SECONDS_PER_LAP * (total_laps - lap_number)
+    tyre_age = stints["tyre_age_at_start"].fillna(0).to_numpy(dtype=float)[idx] + lap_number - stints["lap_start"].to_numpy(dtype=float)[idx]
+
+    # Drop in-laps, safety car and traffic laps relative to each stint's median
+    order = np.lexsort((corrected, idx))
+    counts = np.bincount(idx, minlength=n_stints)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    has_laps = counts > 0
+    medians = np.full(n_stints, np.nan)
+    medians[has_laps] = corrected[order][starts[has_laps] + (counts[has_laps] - 1) // 2]
+    clean = corrected <= medians[idx] * OUTLIER_RATIO
+    idx, x, y = idx[clean], tyre_age[clean], corrected[clean]
+
+    n = np.bincount(idx, minlength=n_stints).astype(float)
+    sx = np.bincount(idx, x, n_stints)
+    sy = np.bincount(idx, y, n_stints)
+    sxx = np.bincount(idx, x * x, n_stints)
+    sxy = np.bincount(idx, x * y, n_stints)
+    denom = n * sxx - sx * sx
+    with np.errstate(invalid="ignore", divide="ignore"):
+        slope = np.where((n >= 3) & (denom > 0), (n * sxy - sx * sy) / denom, np.nan)
+        pace = sy / n
+
+    # Pit window: stay out until the accumulated loss vs fresh tyres (slope * age^2 / 2)
+    # would pay for a stop
+    pit_loss = DEFAULT_PIT_LOSS
+    if pits is not None:
+        pits = _frame(pits)
+        if not pits.empty and "pit_duration" in pits.columns and pits["pit_duration"].notna().any():
+            pit_loss = float(pits["pit_duration"].median())
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ages_to_window = np.ceil(np.sqrt(2 * pit_loss / slope))
+    window_open = np.where(slope > 0, stints["lap_start"].to_numpy(dtype=float) + ages_to_window - stints["tyre_age_at_start"].fillna(0).to_numpy(dtype=float), np.nan)
+
+    result = stints[[c for c in ["driver_number", "stint_number", "compound", "lap_start", "lap_end", "tyre_age_at_start"] if c in stints.columns]].copy()
+    result["laps_used"] = n.astype(int)
+    result["fuel_corrected_pace"] = pace
+    result["deg_per_lap"] = slope
+    result["window_open_lap"] = np.maximum(window_open, stints["lap_start"].to_numpy(dtype=float))
+    return result
+
+
+def sector_deltas(laps):
+    # Each lap's sectors relative to the session-best sector time
+    laps = _frame(laps)
+    sectors = [c for c in SECTORS if c in laps.columns]
+    if laps.empty or not sectors:
+        return pd.DataFrame(), pd.DataFrame()
+    values = laps[sectors].to_numpy(dtype=float)
+    best = np.nanmin(values, axis=0)
+    deltas = laps[["driver_number", "lap_number"]].copy()
+    for i, col in enumerate(sectors):
+        deltas[col.replace("duration_", "delta_")] = values[:, i] - best[i]
+    # Per driver: best of each sector vs session best (gap to an ideal lap)
+    per_driver = deltas.drop(columns="lap_number").groupby("driver_number", sort=True).min()
+    per_driver["ideal_lap_delta"] = per_driver.sum(axis=1, min_count=1)
+    return deltas, per_driver.reset_index()
+
+
+def undercuts(laps, pits):
+    # For every stop, compare the gap to the car ahead before the stop with the gap once
+    # both have stopped (rival pitting within UNDERCUT_WINDOW laps). gain > 0: time gained;
+    # undercut_success: the pitting driver came out ahead. A failed undercut is the rival
+    # holding position, not an overcut by the driver who pitted, so it is not labelled one.
+    laps, pits = _frame(laps), _frame(pits)
+    if laps.empty or pits.empty or "date_start" not in laps.columns:
+        return pd.DataFrame()
+    drivers, d_idx = np.unique(laps["driver_number"].to_numpy(), return_inverse=True)
+    n_laps = int(laps["lap_number"].max()) + 1
+    start = pd.to_datetime(laps["date_start"], utc=True, format="ISO8601")
+    seconds = (start - start.min()).dt.total_seconds().to_numpy()
+    times = np.full((len(drivers), n_laps + 1), np.nan)  # times[d, l] = when driver d started lap l
+    times[d_idx, laps["lap_number"].to_numpy(dtype=int)] = seconds
+
+    pits = pits[pits["driver_number"].isin(drivers)].sort_values(["driver_number", "lap_number"], ignore_index=True)
+    pit_driver = np.searchsorted(drivers, pits["driver_number"].to_numpy())
+    pit_lap = np.clip(pits["lap_number"].to_numpy(dtype=int), 0, n_laps)
+
+    # Car directly ahead at the start of the in-lap
+    at_lap = times[:, pit_lap]                       # drivers x pits
+    own = times[pit_driver, pit_lap]
+    ahead_mask = at_lap < own
+    rival = np.argmax(np.where(ahead_mask, at_lap, -np.inf), axis=0)
+    has_rival = ahead_mask.any(axis=0)
+
+    # Rival's first stop within the window after ours
+    pit_keys = pit_driver * 1000 + pit_lap
+    nxt = np.searchsorted(pit_keys, rival * 1000 + pit_lap + 1)
+    nxt_safe = np.minimum(nxt, len(pit_keys) - 1)
+    rival_lap = pit_lap[nxt_safe]
+    responded = (nxt < len(pit_keys)) & (pit_driver[nxt_safe] == rival) & (rival_lap <= pit_lap + UNDERCUT_WINDOW)
+
+    compare_lap = np.clip(np.maximum(pit_lap, rival_lap) + 2, 0, n_laps)
+    gap_before = own - times[rival, pit_lap]
+    gap_after = times[pit_driver, compare_lap] - times[rival, compare_lap]
+    ok = has_rival & responded & ~np.isnan(gap_after)
+
+    result = pd.DataFrame({
+        "driver_number": drivers[pit_driver[ok]],
+        "rival": drivers[rival[ok]],
+        "pit_lap": pit_lap[ok],
+        "rival_pit_lap": rival_lap[ok],
+        "gap_before": gap_before[ok],
+        "gap_after": gap_after[ok],
+    })
+    result["gain"] = result["gap_before"] - result["gap_after"]
+    result["undercut_success"] = result["gap_after"] < 0
+    return result
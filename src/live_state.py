@@ -0,0 +1,257 @@
+import threading
+from collections import deque
+import pandas as pd
+from .records import records_frame
+
+RECENT_LAPS = 200        # laps kept for the Laps tab
+RECENT_TELEMETRY = 2000  # car_data samples kept for the Telemetry tab
+RECENT_PITS = 20
+RECENT_EVENTS = 50
+RECENT_RADIO = 20
+LOCATION_HISTORY = 200   # location samples kept per driver (~50 s at 4 Hz)
+
+
+class DriverState:
+    __slots__ = ("best_lap", "lap_count", "lap_total", "lap_durations", "pit_count", "pit_laps",
+                 "stints", "compound", "position", "gap_to_leader", "interval", "tyres", "car_data", "locations")
+
+    def __init__(self):
+        self.best_lap = None
+        self.lap_count = 0
+        self.lap_total = 0.0
+        self.lap_durations = {}  # {lap_number: duration counted in lap_total, or None}
+        self.pit_count = 0
+        self.pit_laps = set()  # lap numbers of stops already counted
+        self.stints = {}  # {stint_number: stint dict}
+        self.compound = None
+        self.position = None
+        self.gap_to_leader = None
+        self.interval = None
+        self.tyres = None
+        self.car_data = None
+        self.locations = deque(maxlen=LOCATION_HISTORY)  # (date, x, y, z)
+
+    def copy(self):
+        other = DriverState()
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        other.lap_durations = dict(self.lap_durations)
+        other.pit_laps = set(self.pit_laps)
+        other.stints = dict(self.stints)
+        other.locations = deque(self.locations, maxlen=LOCATION_HISTORY)
+        return other
+
+
+class LiveState:
+    # Running per-driver aggregates, updated in O(1) per MQTT message.
+    # snapshot() returns the same insight shapes generate_insights produces.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.drivers = {}
+            self.fastest_lap = None  # (lap_duration, driver_number, lap_number)
+            self.laps = deque(maxlen=RECENT_LAPS)
+            self.telemetry = deque(maxlen=RECENT_TELEMETRY)
+            self.pits = deque(maxlen=RECENT_PITS)
+            self.events = deque(maxlen=RECENT_EVENTS)
+            self.radio = deque(maxlen=RECENT_RADIO)
+            self.weather = None
+            self.version = 0
+            self.topic_versions = {}  # {topic: messages applied}
+            self.frames = {}          # {insight: (topic version, frame)} reused while the topic is unchanged
+            self.handlers = {
+                "v1/laps": self._on_lap,
+                "v1/position": self._on_position,
+                "v1/intervals": self._on_interval,
+                "v1/pit": self._on_pit,
+                "v1/stints": self._on_stint,
+                "v1/tyres": self._on_tyres,
+                "v1/car_data": self._on_car_data,
+                "v1/weather": self._on_weather,
+                "v1/race_control": self._on_race_control,
+                "v1/team_radio": self._on_team_radio,
+                "v1/location": self._on_location,
+            }
+
+    def copy(self):
+        # Independent state at the same point in the stream; payloads are shared, as handlers never mutate them
+        other = LiveState()
+        with self.lock:
+            other.drivers = {num: state.copy() for num, state in self.drivers.items()}
+            other.fastest_lap = self.fastest_lap
+            for name in ("laps", "telemetry", "pits", "events", "radio"):
+                buffer = getattr(self, name)
+                setattr(other, name, deque(buffer, maxlen=buffer.maxlen))
+            other.weather = self.weather
+            other.version = self.version
+            other.topic_versions = dict(self.topic_versions)
+        return other
+
+    def _driver(self, payload):
+        num = payload.get("driver_number")
+        if num is None:
+            return None
+        state = self.drivers.get(num)
+        if state is None:
+            state = self.drivers[num] = DriverState()
+        return state
+
+    def apply(self, topic, payload):
+        handler = self.handlers.get(topic)
+        if handler is None:
+            return
+        with self.lock:
+            handler(payload)
+            self.version += 1
+            self.topic_versions[topic] = self.topic_versions.get(topic, 0) + 1
+
+    def _on_lap(self, lap):
+        state = self._driver(lap)
+        duration = lap.get("lap_duration")
+        if state is None:
+            return
+        # The same lap can be re-published as sectors complete; keep one row per lap, the latest
+        lap_number = lap.get("lap_number")
+        if lap_number in state.lap_durations:
+            for i, seen in enumerate(reversed(self.laps)):
+                if seen.get("driver_number") == lap.get("driver_number") and seen.get("lap_number") == lap_number:
+                    self.laps[-1 - i] = lap
+                    break
+            else:
+                self.laps.append(lap)  # already evicted from the recent buffer
+        else:
+            self.laps.append(lap)
+            if lap_number is not None:
+                state.lap_durations[lap_number] = None
+        if duration is None:
+            return
+        counted = state.lap_durations.get(lap_number)
+        if counted is not None:
+            # Count a re-published lap once
+            state.lap_total -= counted
+            state.lap_count -= 1
+        if lap_number is not None:
+            state.lap_durations[lap_number] = duration
+        state.lap_count += 1
+        state.lap_total += duration
+        if state.best_lap is None or duration < state.best_lap:
+            state.best_lap = duration
+        if self.fastest_lap is None or duration < self.fastest_lap[0]:
+            self.fastest_lap = (duration, lap["driver_number"], lap.get("lap_number"))
+
+    def _on_position(self, position):
+        state = self._driver(position)
+        if state is not None:
+            state.position = position.get("position")
+
+    def _on_interval(self, interval):
+        state = self._driver(interval)
+        if state is not None:
+            state.gap_to_leader = interval.get("gap_to_leader")
+            state.interval = interval.get("interval")
+
+    def _on_pit(self, pit):
+        state = self._driver(pit)
+        if state is None:
+            return
+        # A stop can be re-published (e.g. once pit_duration is known); count it once and keep the latest
+        lap_number = pit.get("lap_number")
+        if lap_number is not None and lap_number in state.pit_laps:
+            for i, seen in enumerate(self.pits):
+                if seen.get("driver_number") == pit.get("driver_number") and seen.get("lap_number") == lap_number:
+                    self.pits[i] = pit
+                    break
+            return
+        if lap_number is not None:
+            state.pit_laps.add(lap_number)
+        state.pit_count += 1
+        self.pits.appendleft(pit)
+
+    def _on_stint(self, stint):
+        state = self._driver(stint)
+        if state is None:
+            return
+        number = stint.get("stint_number", len(state.stints) + 1)
+        state.stints[number] = stint
+        if number >= max(state.stints):
+            state.compound = stint.get("compound")
+
+    def _on_tyres(self, tyres):
+        state = self._driver(tyres)
+        if state is not None:
+            state.tyres = tyres
+
+    def _on_car_data(self, sample):
+        state = self._driver(sample)
+        if state is not None:
+            state.car_data = sample
+            self.telemetry.append(sample)
+
+    def _on_location(self, sample):
+        state = self._driver(sample)
+        if state is not None:
+            state.locations.append((sample.get("date"), sample.get("x"), sample.get("y"), sample.get("z")))
+
+    def _on_weather(self, weather):
+        self.weather = weather
+
+    def _on_race_control(self, event):
+        self.events.appendleft(event)
+
+    def _on_team_radio(self, radio):
+        self.radio.appendleft(radio)
+
+    def _frame(self, key, version, rows, build):
+        cached = self.frames.get(key)
+        if cached is None or cached[0] != version:
+            cached = self.frames[key] = (version, build(rows))
+        return cached[1]
+
+    def _stale(self, key, topic):
+        cached = self.frames.get(key)
+        return cached is None or cached[0] != self.topic_versions.get(topic, 0)
+
+    def snapshot(self):
+        # Cost depends on the number of drivers and the bounded recent buffers, not session length.
+        # Only plain copies are taken under the lock; DataFrames are built after releasing it so
+        # the MQTT thread's apply() is never blocked on pandas.
+        buffers = {"laps": ("v1/laps", "laps"), "recent_pits": ("v1/pit", "pits"), "telemetry": ("v1/car_data", "telemetry"),
+                   "race_events": ("v1/race_control", "events"), "team_radio": ("v1/team_radio", "radio")}
+        with self.lock:
+            drivers = list(self.drivers.items())
+            versions = dict(self.topic_versions)
+            insights = {"version": self.version, "topic_versions": versions}
+            standings = [
+                {"driver_number": num, "position": s.position, "gap_to_leader": s.gap_to_leader,
+                 "interval": s.interval, "compound": s.compound}
+                for num, s in drivers if s.position is not None or s.gap_to_leader is not None
+            ]
+            if self.fastest_lap is not None:
+                insights["fastest_lap"] = {"driver_number": self.fastest_lap[1], "time": self.fastest_lap[0], "lap_number": self.fastest_lap[2]}
+            insights["average_lap_times"] = {num: s.lap_total / s.lap_count for num, s in drivers if s.lap_count}
+            insights["best_laps"] = {num: s.best_lap for num, s in drivers if s.best_lap is not None}
+            insights["pit_counts"] = {num: s.pit_count for num, s in drivers if s.pit_count}
+            insights["stints"] = {num: [s.stints[k] for k in sorted(s.stints)] for num, s in drivers if s.stints}
+            tyres = [s.tyres for _, s in drivers if s.tyres is not None] if self._stale("tyres", "v1/tyres") else None
+            # Recent buffers are only copied when their topic changed since the cached frame
+            rows = {key: list(getattr(self, name)) if self._stale(key, topic) else None for key, (topic, name) in buffers.items()}
+            if self.weather is not None:
+                insights["weather"] = dict(self.weather)
+            insights["locations"] = {num: s.locations[-1][1:3] for num, s in drivers if s.locations and s.locations[-1][1] is not None}
+            insights["speeds"] = {num: s.car_data.get("speed") for num, s in drivers if s.car_data}
+
+        standings.sort(key=lambda row: row["position"] if row["position"] is not None else 99)
+        insights["standings"] = pd.DataFrame(standings, columns=["driver_number", "position", "gap_to_leader", "interval", "compound"])
+        insights["laps"] = self._frame("laps", versions.get("v1/laps", 0), rows["laps"], pd.DataFrame)
+        insights["recent_pits"] = self._frame("recent_pits", versions.get("v1/pit", 0), rows["recent_pits"],
+                                              lambda r: pd.DataFrame(r, columns=["driver_number", "lap_number", "pit_duration"]))
+        insights["pits"] = insights["recent_pits"]
+        insights["tyres"] = self._frame("tyres", versions.get("v1/tyres", 0), tyres, lambda r: pd.DataFrame(r, columns=["driver_number", "compound", "fresh_tyre"]))
+        insights["telemetry"] = self._frame("telemetry", versions.get("v1/car_data", 0), rows["telemetry"], records_frame)
+        insights["race_events"] = self._frame("race_events", versions.get("v1/race_control", 0), rows["race_events"], pd.DataFrame)
+        insights["team_radio"] = self._frame("team_radio", versions.get("v1/team_radio", 0), rows["team_radio"],
+                                             lambda r: pd.DataFrame(r, columns=["driver_number", "date", "recording_url"]))
+        return insights
@@ -0,0 +1,235 @@
+import asyncio
+import random
+from collections import OrderedDict
+import paho.mqtt.client as mqtt
+import ssl
+
+QUEUE_SIZE = 256           # messages held per consumer queue
+RECONNECT_BASE = 1.0       # seconds; doubled per failed attempt, with +-50% jitter
+RECONNECT_CAP = 60.0
+TOKEN_REFRESH_MARGIN = 300  # refresh the access token this many seconds before it expires
+MISC_INTERVAL = 1.0        # paho keepalive/retry housekeeping
+
+# Topics where only the newest message per driver matters to a consumer that fell behind
+TOPIC_OVERFLOW = {
+    "v1/car_data": "coalesce",
+    "v1/location": "coalesce",
+    "v1/position": "coalesce",
+    "v1/intervals": "coalesce",
+    "v1/tyres": "coalesce",
+}
+
+
+class DropOldestQueue(asyncio.Queue):
+    # Bounded queue that makes room by discarding the oldest message instead of blocking
+    def offer(self, item):
+        dropped = 0
+        while self.full():
+            self.get_nowait()
+            self.task_done()
+            dropped += 1
+        self.put_nowait(item)
+        return dropped
+
+
+class CoalescingQueue(asyncio.Queue):
+    # Bounded queue holding at most one pending message per driver: a newer message
+    # replaces the queued one in place, so a slow consumer only ever sees fresh data.
+    def _init(self, maxsize):
+        self._queue = OrderedDict()
+
+    def _put(self, item):
+        self._queue[item.get("driver_number")] = item
+
+    def _get(self):
+        return self._queue.popitem(last=False)[1]
+
+    def offer(self, item):
+        key = item.get("driver_number")
+        if key in self._queue:
+            self._queue[key] = item
+            return 1
+        dropped = 0
+        while self.full():
+            self.get_nowait()
+            self.task_done()
+            dropped += 1
+        self.put_nowait(item)
+        return dropped
+
+
+OVERFLOW_POLICIES = {"drop_oldest": DropOldestQueue, "coalesce": CoalescingQueue}
+
+
+class LiveStream:
+    # MQTT stream driven by the asyncio event loop (paho's socket callbacks, no network
+    # thread). Messages go through OpenF1Client.dispatch, then into bounded per-consumer
+    # queues; `updated` is set on every message so the UI can wait instead of polling.
+    # Drops reconnect with jittered exponential backoff, refreshing the token as needed.
+    def __init__(self, client, overflow=None, maxsize=QUEUE_SIZE):
+        self.client = client
+        self.overflow = dict(TOPIC_OVERFLOW, **(overflow or {}))
+        self.maxsize = maxsize
+        self.queues = {}  # {topic: [queue, ...]}
+        self.dropped = {}  # {topic: messages discarded by overflow policies}
+        self.updated = asyncio.Event()
+        self.connected = asyncio.Event()
+        self.disconnected = asyncio.Event()
+        self.reconnects = 0
+        self.loop = None
+        self.mqttc = None
+        self.tasks = []
+        self.stopping = False
+        self.auth_failed = False
+
+    # Consumers
+
+    def subscribe(self, topic, maxsize=None, overflow=None):
+        policy = overflow or self.overflow.get(topic, "drop_oldest")
+        queue = OVERFLOW_POLICIES[policy](maxsize or self.maxsize)
+        self.queues.setdefault(topic, []).append(queue)
+        return queue
+
+    def unsubscribe(self, topic, queue):
+        if queue in self.queues.get(topic, []):
+            self.queues[topic].remove(queue)
+
+    async def messages(self, topic, **queue_options):
+        queue = self.subscribe(topic, **queue_options)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.unsubscribe(topic, queue)
+
+    async def wait_for_update(self, timeout=None):
+        # True once at least one message arrived since the last call
+        try:
+            await asyncio.wait_for(self.updated.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.updated.clear()
+        return True
+
+    # Lifecycle
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        if self.client.mqtt_tls:
+            await self.refresh_token()
+            if not self.client.access_token:
+                raise Exception("Access token required for live mode.")
+        self.mqttc = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        if self.client.mqtt_tls:
+            self.mqttc.tls_set(cert_reqs=ssl.CERT_REQUIRED, tls_version=ssl.PROTOCOL_TLS_CLIENT)
+        self.mqttc.on_connect = self._on_connect
+        self.mqttc.on_disconnect = self._on_disconnect
+        self.mqttc.on_message = self._on_message
+        self.mqttc.on_socket_open = self._on_socket_open
+        self.mqttc.on_socket_close = self._on_socket_close
+        self.mqttc.on_socket_register_write = self._on_socket_register_write
+        self.mqttc.on_socket_unregister_write = self._on_socket_unregister_write
+        self.tasks = [self.loop.create_task(self._supervise())]
+        if self.client.mqtt_tls:
+            self.tasks.append(self.loop.create_task(self._token_refresher()))
+
+    def stop(self):
+        self.stopping = True
+        for task in self.tasks:
+            task.cancel()
+        if self.mqttc is not None:
+            self.mqttc.disconnect()
+        self.client.connected = False
+
+    async def refresh_token(self):
+        # get_access_token is a blocking HTTP call; keep it off the event loop
+        await self.loop.run_in_executor(None, self.client.get_access_token)
+        self.auth_failed = False
+
+    async def _token_refresher(self):
+        while True:
+            await asyncio.sleep(max(self.client.token_expires_in() - TOKEN_REFRESH_MARGIN, MISC_INTERVAL * 30))
+            try:
+                await self.refresh_token()
+            except Exception as e:
+                print(f"Token refresh failed: {e}")
+
+    async def _supervise(self):
+        attempt = 0
+        while not self.stopping:
+            self.disconnected.clear()
+            try:
+                if self.client.mqtt_tls and (self.auth_failed or self.client.token_expires_in() < TOKEN_REFRESH_MARGIN):
+                    await self.refresh_token()
+                if self.client.mqtt_tls:
+                    self.mqttc.username_pw_set(username=self.client.username, password=self.client.access_token)
+                # TCP/TLS handshake blocks, so it runs in a worker; paho hands the socket back via callbacks
+                await self.loop.run_in_executor(None, self.mqttc.connect, self.client.mqtt_broker, self.client.mqtt_port, 60)
+                await self.disconnected.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"MQTT connection failed: {e}")
+            if self.stopping:
+                break
+            attempt = 1 if self.connected.is_set() else attempt + 1
+            self.connected.clear()
+            self.reconnects += 1
+            delay = min(RECONNECT_CAP, RECONNECT_BASE * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+            print(f"MQTT disconnected; reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    # paho callbacks (run on the event loop, except during connect)
+
+    def _on_connect(self, mqttc, userdata, flags, reason_code, properties=None):
+        self.client.on_connect(mqttc, userdata, flags, reason_code, properties)
+        if reason_code == 0:
+            self.connected.set()
+        elif reason_code in (4, 5, 134, 135):  # bad credentials / not authorized: token expired or revoked
+            self.auth_failed = True
+
+    def _on_disconnect(self, mqttc, userdata, flags, reason_code, properties=None):
+        self.client.connected = False
+        self._in_loop(self.disconnected.set)
+
+    def _on_message(self, mqttc, userdata, msg):
+        payload = self.client.dispatch(msg.topic, msg.payload)
+        for queue in self.queues.get(msg.topic, ()):
+            dropped = queue.offer(payload)
+            if dropped:
+                self.dropped[msg.topic] = self.dropped.get(msg.topic, 0) + dropped
+        self.updated.set()
+
+    def _on_socket_open(self, mqttc, userdata, sock):
+        self._in_loop(self.loop.add_reader, sock, mqttc.loop_read)
+        self._in_loop(self._start_misc)
+
+    def _on_socket_close(self, mqttc, userdata, sock):
+        self._in_loop(self.loop.remove_reader, sock)
+
+    def _on_socket_register_write(self, mqttc, userdata, sock):
+        self._in_loop(self.loop.add_writer, sock, mqttc.loop_write)
+
+    def _on_socket_unregister_write(self, mqttc, userdata, sock):
+        self._in_loop(self.loop.remove_writer, sock)
+
+    def _in_loop(self, fn, *args):
+        # Selector changes must happen on the event loop thread; connect() runs in a worker.
+        # On the loop itself they run immediately, before paho closes the socket.
+        try:
+            on_loop = asyncio.get_running_loop() is self.loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            fn(*args)
+        else:
+            self.loop.call_soon_threadsafe(fn, *args)
+
+    def _start_misc(self):
+        self.tasks = [task for task in self.tasks if not task.done()]
+        self.tasks.append(self.loop.create_task(self._misc_loop()))
+
+    async def _misc_loop(self):
+        # Keepalive pings and retries; ends when the socket closes
+        while self.mqttc.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+            await asyncio.sleep(MISC_INTERVAL)
@@ -0,0 +1,134 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+import numpy as np
+import pandas as pd
+from .session_store import SessionStore
+from . import lap_analytics
+
+# What a season aggregate needs from each session, read column-pruned from the store
+AGGREGATE_COLUMNS = {
+    "laps": ["driver_number", "lap_number", "lap_duration", "is_pit_out_lap", *lap_analytics.SECTORS],
+    "stints": ["driver_number", "stint_number", "compound", "lap_start", "lap_end", "tyre_age_at_start"],
+    "pit": ["driver_number", "lap_number", "pit_duration"],
+}
+SESSION_COLUMNS = ["session_key", "meeting_key", "session_name", "date_start", "year", "circuit_short_name", "country_name"]
+
+
+def resolve_sessions(client, session_keys=None, year=None, meeting_key=None, session_name="Race"):
+    # Session metadata for explicit keys or for year/meeting_key filters, oldest first
+    if session_keys:
+        rows = [row for key in session_keys for row in client.fetch_historical("sessions", {"session_key": key})]
+    else:
+        params = {k: v for k, v in (("year", year), ("meeting_key", meeting_key), ("session_name", session_name)) if v is not None}
+        rows = client.fetch_historical("sessions", params)
+    sessions = pd.DataFrame(rows, columns=SESSION_COLUMNS)
+    return sessions.sort_values("date_start", ignore_index=True)
+
+
+def session_aggregates(store_dir, session_key):
+    # Worker: one session from the columnar store -> small per-driver and per-stint frames
+    # Missing files or columns (e.g. a session with no laps yet) read as empty columns
+    store = SessionStore(store_dir)
+    frames = {ep: (store.read(session_key, ep, columns=cols) if store.has(session_key, ep) else pd.DataFrame()).reindex(columns=cols)
+              for ep, cols in AGGREGATE_COLUMNS.items()}
+    laps = frames["laps"].dropna(subset=["lap_duration"])
+    if laps.empty:
+        return session_key, pd.DataFrame(), pd.DataFrame()
+    laps = laps.assign(driver_number=laps["driver_number"].astype("int64"))
+
+    # Race pace: each driver's median over laps within 107% of their own median
+    by_driver = laps.groupby("driver_number")["lap_duration"]
+    median = by_driver.transform("median")
+    clean = laps[laps["lap_duration"] <= median * lap_analytics.OUTLIER_RATIO]
+    pace = clean.groupby("driver_number")["lap_duration"].agg(clean_laps="size", median_lap="median").join(
+        by_driver.agg(laps="size", best_lap="min")).reset_index()
+    pace["pace_pct"] = pace["median_lap"] / pace["median_lap"].min() * 100  # 100 = fastest driver of the session
+
+    stints = lap_analytics.stint_analysis(laps, frames["stints"], frames["pit"])
+    if not stints.empty:
+        last_lap = laps.groupby("driver_number")["lap_number"].max()
+        lap_end = stints["lap_end"].fillna(stints["driver_number"].map(last_lap))
+        stints = stints.assign(stint_laps=lap_end - stints["lap_start"] + 1)
+    return session_key, pace, stints
+
+
+class MultiSessionEngine:
+    # Season-wide analysis: sessions are made local once (SessionStore), then aggregated
+    # in a process pool, one session per task, and merged with session/driver metadata.
+    def __init__(self, client, store=None, max_workers=None):
+        self.client = client
+        self.store = store or SessionStore()
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.session_drivers = {}  # {session_key: {driver_number: (full_name, team_name)}}
+
+    def sessions(self, session_keys=None, year=None, meeting_key=None, session_name="Race"):
+        return resolve_sessions(self.client, session_keys, year, meeting_key, session_name)
+
+    def ensure_local(self, session_keys):
+        # Fetch endpoints missing from the store; REST calls share the client's connection
+        # pool and per-host limit, so sessions are simply fanned out over threads. Sessions
+        # that have not finished are skipped, so the store only ever holds final data; a
+        # finished session's empty endpoints (e.g. no pit stops) are stored too, like
+        # SessionStore.write_chunks does, so they are not refetched on every run.
+        def load(session_key):
+            if not self.client.session_finished(session_key):
+                return
+            missing = self.store.missing(session_key, list(AGGREGATE_COLUMNS))
+            if missing:
+                fetched = self.client.fetch_session(session_key, missing)
+                self.store.write_session(session_key, fetched)
+            if session_key not in self.session_drivers:
+                drivers = self.client.fetch_historical("drivers", {"session_key": session_key})
+                self.session_drivers[session_key] = {d["driver_number"]: (d.get("full_name", f"Driver {d['driver_number']}"), d.get("team_name", "Unknown"))
+                                                     for d in drivers}
+        with ThreadPoolExecutor(max_workers=self.client.max_concurrency) as pool:
+            list(pool.map(load, session_keys))
+
+    def aggregate(self, sessions):
+        # sessions: resolve_sessions() frame or a list of keys -> {"pace": df, "stints": df}
+        if not isinstance(sessions, pd.DataFrame):
+            sessions = self.sessions(session_keys=list(sessions))
+        keys = sessions["session_key"].tolist()
+        self.ensure_local(keys)
+        work = partial(session_aggregates, self.store.root_dir)
+        if self.max_workers > 1 and len(keys) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(keys))) as pool:
+                results = list(pool.map(work, keys))
+        else:
+            results = [work(key) for key in keys]
+        meta = sessions.set_index("session_key")[["circuit_short_name", "date_start"]]
+        return {name: self._merge([(key, frames[i]) for key, *frames in results], meta) for i, name in enumerate(["pace", "stints"])}
+
+    def _merge(self, parts, meta):
+        frames = [df.assign(session_key=key) for key, df in parts if not df.empty]
+        if not frames:
+            return pd.DataFrame()
+        merged = pd.concat(frames, ignore_index=True).join(meta, on="session_key")
+        names = {(key, num): name for key, drivers in self.session_drivers.items() for num, (name, _) in drivers.items()}
+        teams = {(key, num): team for key, drivers in self.session_drivers.items() for num, (_, team) in drivers.items()}
+        pairs = list(zip(merged["session_key"], merged["driver_number"]))
+        merged["driver"] = [names.get(p, f"Driver {p[1]}") for p in pairs]
+        merged["team"] = [teams.get(p, "Unknown") for p in pairs]
+        return merged
+
+    def driver_pace(self, aggregates):
+        # Driver x circuit table of race pace (% of the session's fastest median lap)
+        pace = aggregates["pace"]
+        if pace.empty:
+            return pace
+        table = pace.pivot_table(index="driver", columns="circuit_short_name", values="pace_pct", aggfunc="first")
+        circuits = pace.sort_values("date_start")["circuit_short_name"].unique()
+        table = table[[c for c in circuits if c in table.columns]]
+        table["season"] = table.median(axis=1)
+        return table.sort_values("season")
+
+    def stint_lengths(self, aggregates):
+        # Stint length distribution per circuit and compound
+        stints = aggregates["stints"]
+        if stints.empty:
+            return stints
+        grouped = stints.dropna(subset=["stint_laps"]).groupby(["circuit_short_name", "compound"], observed=True)["stint_laps"]
+        result = grouped.describe(percentiles=[0.25, 0.5, 0.75])[["count", "mean", "25%", "50%", "75%", "max"]]
+        result["deg_per_lap"] = stints.groupby(["circuit_short_name", "compound"], observed=True)["deg_per_lap"].median()
+        return result.replace([np.inf, -np.inf], np.nan).reset_index()
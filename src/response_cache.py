@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "openf1")
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GB of compressed payloads
+
+
+class ResponseCache:
+    # Persistent cache of REST responses, one gzip file per (endpoint, params) key.
+    # Entries are evicted least-recently-used once the total size passes max_bytes.
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, compress_level=6):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.compress_level = compress_level
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # {key: size_bytes}, oldest access first
+        self.total_bytes = 0
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0,
+                         "bytes_read": 0, "bytes_written": 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        # Rebuild LRU order from file mtimes (touched on every hit)
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    st = os.stat(os.path.join(root, name))
+                    found.append((st.st_mtime, name[:-len(".json.gz")], st.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+
+    @staticmethod
+    def make_key(endpoint, params=None):
+        # Normalize params so {"a": 1, "b": "2"} and {"b": 2, "a": "1"} share an entry
+        normalized = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        raw = json.dumps([endpoint.strip("/"), normalized], separators=(",", ":"))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def get(self, endpoint, params=None):
+        key = self.make_key(endpoint, params)
+        path = self._path(key)
+        with self.lock:
+            if key not in self.entries:
+                self.counters["misses"] += 1
+                return None
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+            record = json.loads(gzip.decompress(blob))
+        except (OSError, ValueError):
+            self._remove(key)
+            with self.lock:
+                self.counters["misses"] += 1
+            return None
+
+        expires = record.get("expires")
+        if expires is not None and expires < time.time():
+            self._remove(key)
+            with self.lock:
+                self.counters["expired"] += 1
+                self.counters["misses"] += 1
+            return None
+
+        with self.lock:
+            self.counters["hits"] += 1
+            self.counters["bytes_read"] += len(blob)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return record["data"]
+
+    def put(self, endpoint, params, data, ttl=None):
+        # ttl=None stores the entry forever (finished sessions never change)
+        key = self.make_key(endpoint, params)
+        expires = time.time() + ttl if ttl is not None else None
+        blob = gzip.compress(json.dumps({"expires": expires, "data": data}).encode(), self.compress_level)
+        if len(blob) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.total_bytes += len(blob) - self.entries.pop(key, 0)
+            self.entries[key] = len(blob)
+            self.counters["bytes_written"] += len(blob)
+            evicted = []
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                old_key, old_size = self.entries.popitem(last=False)
+                self.total_bytes -= old_size
+                self.counters["evictions"] += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            self._unlink(old_key)
+
+    def _remove(self, key):
+        with self.lock:
+            self.total_bytes -= self.entries.pop(key, 0)
+        self._unlink(key)
+
+    def _unlink(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        with self.lock:
+            keys = list(self.entries)
+            self.entries.clear()
+            self.total_bytes = 0
+        for key in keys:
+            self._unlink(key)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self.entries),
+                "size_bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hit_ratio": self.counters["hits"] / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import gzip
+import json
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+LOG_FORMAT = "openf1-mqtt-log"
+LOG_VERSION = 1
+FLUSH_EVERY = 1000  # messages between flushes of the compressed log
+
+# Stand-in for a paho MQTTMessage when feeding OpenF1Client.on_message directly
+ReplayMessage = namedtuple("ReplayMessage", ["topic", "payload"])
+
+
+class SessionRecorder:
+    # Raw MQTT messages -> gzip log, one "<seconds since start>\t<topic>\t<payload>" line each.
+    # Payloads are stored as received (compact JSON has no raw newlines), so a replay
+    # goes through exactly the same decode path as the live stream.
+    def __init__(self, path, compress_level=6):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = gzip.open(path, "wb", compresslevel=compress_level)
+        self.started = time.monotonic()
+        self.count = 0
+        header = {"format": LOG_FORMAT, "version": LOG_VERSION, "started": datetime.now(timezone.utc).isoformat()}
+        self.file.write(json.dumps(header).encode() + b"\n")
+
+    def record(self, topic, payload, offset=None):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        if offset is None:
+            offset = time.monotonic() - self.started
+        line = f"{offset:.4f}\t{topic}\t".encode() + payload.replace(b"\n", b"") + b"\n"
+        with self.lock:
+            if self.file is None:
+                return
+            self.file.write(line)
+            self.count += 1
+            if self.count % FLUSH_EVERY == 0:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_log(path):
+    # (offset seconds, topic, raw payload bytes) in recorded order
+    with gzip.open(path, "rb") as f:
+        header = json.loads(f.readline())
+        if header.get("format") != LOG_FORMAT:
+            raise ValueError(f"{path} is not an OpenF1 MQTT log")
+        for line in f:
+            offset, topic, payload = line.rstrip(b"\n").split(b"\t", 2)
+            yield float(offset), topic.decode(), payload
+
+
+class SessionReplayer:
+    # Plays a recorded log back at 1x/10x/... or as fast as possible (speed=None).
+    def __init__(self, path):
+        self.path = path
+
+    def messages(self):
+        return read_log(self.path)
+
+    def replay(self, sink, speed=1.0, limit=None):
+        # sink(topic, payload_bytes) for every message, paced by the recorded offsets
+        started = time.perf_counter()
+        count = 0
+        for offset, topic, payload in self.messages():
+            if speed:
+                wait = offset / speed - (time.perf_counter() - started)
+                if wait > 0:
+                    time.sleep(wait)
+            sink(topic, payload)
+            count += 1
+            if limit is not None and count >= limit:
+                break
+        return count
+
+    def feed(self, client, speed=None, limit=None):
+        # Straight into OpenF1Client.on_message: JSON decode, topic buffers and handlers, no broker
+        return self.replay(lambda topic, payload: client.on_message(None, None, ReplayMessage(topic, payload)), speed, limit)
+
+    def publish(self, host="localhost", port=1883, speed=1.0, limit=None):
+        # To a local broker (e.g. mosquitto); point the app at it with OPENF1_MQTT_BROKER,
+        # OPENF1_MQTT_PORT and OPENF1_MQTT_TLS=0 to exercise the full network path.
+        import paho.mqtt.client as mqtt
+        client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+        client.connect(host, port, 60)
+        client.loop_start()
+        try:
+            return self.replay(lambda topic, payload: client.publish(topic, payload), speed, limit)
+        finally:
+            client.loop_stop()
+            client.disconnect()
+
+
+def parse_speed(value):
+    return None if value in ("max", "0") else float(value.rstrip("x"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record or replay OpenF1 MQTT sessions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="capture the live MQTT stream to a log file")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--seconds", type=float, default=None, help="stop after this long (default: until Ctrl+C)")
+    replay_parser = commands.add_parser("replay", help="publish a log to a local MQTT broker")
+    replay_parser.add_argument("path")
+    replay_parser.add_argument("--host", default="localhost")
+    replay_parser.add_argument("--port", type=int, default=1883)
+    replay_parser.add_argument("--speed", type=parse_speed, default=1.0, help="1, 10 or max")
+    args = parser.parse_args(argv)
+
+    if args.command == "replay":
+        count = SessionReplayer(args.path).publish(args.host, args.port, args.speed)
+        print(f"Replayed {count} messages to {args.host}:{args.port}")
+        return
+
+    try:
+        count = asyncio.run(record(args.path, args.seconds))
+    except KeyboardInterrupt:
+        count = "?"
+    print(f"Recorded {count} messages to {args.path}")
+
+
+async def record(path, seconds=None):
+    from .api_client import OpenF1Client
+    client = OpenF1Client(cache=False)
+    with SessionRecorder(path) as recorder:
+        client.recorder = recorder
+        await client.start_mqtt_stream()
+        try:
+            if seconds:
+                await asyncio.sleep(seconds)
+            else:
+                await asyncio.Event().wait()  # until Ctrl+C
+        finally:
+            client.close()
+    return recorder.count
+
+if __name__ == "__main__":
+    main()
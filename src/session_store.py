@@ -0,0 +1,180 @@
+import os
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .records import records_frame
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "openf1", "sessions")
+ROW_GROUP_SIZE = 65536
+
+# Column typing applied to every endpoint before it is written
+DATE_COLUMNS = ["date", "date_start", "date_end"]
+CATEGORY_COLUMNS = ["compound", "category", "flag", "scope"]
+STRING_COLUMNS = ["gap_to_leader", "interval"]  # float seconds or "+1 LAP"; kept as text so chunks agree
+SORT_COLUMNS = ["driver_number", "date"]  # clusters rows so driver filters skip row groups
+
+
+def to_frame(records):
+    # List-of-dicts API payload (or live records) -> typed DataFrame
+    df = records_frame(records)
+    for col in df.columns:
+        if col in DATE_COLUMNS and pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], unit="ns", utc=True)  # lean live records (epoch ns)
+        elif col in DATE_COLUMNS:
+            df[col] = pd.to_datetime(df[col], utc=True, format="ISO8601", errors="coerce")
+        elif col == "driver_number":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int16")
+        elif col in CATEGORY_COLUMNS:
+            df[col] = df[col].astype("category")
+        elif col in STRING_COLUMNS:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str)).astype(object)
+        elif df[col].dtype == object:
+            kind = pd.api.types.infer_dtype(df[col], skipna=True)
+            if kind.startswith("mixed-integer") or kind in ("integer", "floating"):
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+            elif kind == "mixed":
+                # e.g. gap_to_leader is a float or "+1 LAP"
+                df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    sort_cols = [c for c in SORT_COLUMNS if c in df.columns]
+    if sort_cols:
+        df = df.sort_values(sort_cols, kind="stable", ignore_index=True)
+    return df
+
+
+CAST_ERRORS = (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError)
+
+
+def _conform(table, schema):
+    # Cast a chunk to the file schema; columns the chunk lacks become nulls. Raises
+    # (CAST_ERRORS, or KeyError for a column the schema lacks) rather than drop data.
+    extra = [name for name in table.column_names if name not in schema.names]
+    if extra:
+        raise KeyError(f"columns not in the file schema: {extra}")
+    columns = [table.column(field.name).cast(field.type) if field.name in table.column_names else pa.nulls(len(table), field.type)
+               for field in schema]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _promote(schema, other):
+    # Smallest schema both chunks fit: null -> any type, int -> wider int/float, new
+    # columns appended; a column that is numeric in one chunk and text in another
+    # becomes text, as STRING_COLUMNS are.
+    fields = {field.name: field for field in schema}
+    for field in other:
+        current = fields.get(field.name)
+        if current is None:
+            fields[field.name] = field
+            continue
+        try:
+            fields[field.name] = pa.unify_schemas([pa.schema([current]), pa.schema([field])], promote_options="permissive").field(0)
+        except CAST_ERRORS:
+            fields[field.name] = pa.field(field.name, pa.string())
+    return pa.schema(list(fields.values()))
+
+
+class SessionStore:
+    # One Parquet file per (session_key, endpoint), written once and read back
+    # memory-mapped with column selection and driver/lap predicates pushed down.
+    def __init__(self, root_dir=None):
+        self.root_dir = root_dir or os.getenv("OPENF1_STORE_DIR") or DEFAULT_STORE_DIR
+
+    def _path(self, session_key, endpoint):
+        return os.path.join(self.root_dir, str(session_key), f"{endpoint.split('/')[-1]}.parquet")
+
+    def has(self, session_key, endpoint):
+        return os.path.exists(self._path(session_key, endpoint))
+
+    def missing(self, session_key, endpoints):
+        return [ep for ep in endpoints if not self.has(session_key, ep)]
+
+    def write(self, session_key, endpoint, records):
+        df = records if isinstance(records, pd.DataFrame) else to_frame(records)
+        path = self._path(session_key, endpoint)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE, compression="zstd")
+        os.replace(tmp_path, path)
+        return df
+
+    def write_chunks(self, session_key, endpoint, chunks):
+        # Append each chunk of records as its own row group and yield its typed frame.
+        # The file only becomes visible once every chunk has been written.
+        path = self._path(session_key, endpoint)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        writer = None
+        try:
+            for records in chunks:
+                if not len(records):
+                    continue
+                df = to_frame(records)
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_path, table.schema, compression="zstd")
+                else:
+                    try:
+                        table = _conform(table, writer.schema)
+                    except (KeyError, *CAST_ERRORS):
+                        writer, tmp_path = self._rewrite(writer, tmp_path, _promote(writer.schema, table.schema))
+                        table = _conform(table, writer.schema)
+                writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+                yield df
+            if writer is None:
+                pq.write_table(pa.table({}), tmp_path)
+            else:
+                writer.close()
+                writer = None
+            os.replace(tmp_path, path)
+        finally:
+            if writer is not None:
+                writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _rewrite(writer, tmp_path, schema):
+        # Copy the row groups written so far into a new file with the promoted schema (rare:
+        # only when a later window disagrees with the first one); returns its writer and path
+        writer.close()
+        promoted_path = f"{tmp_path}.promoted"
+        promoted = pq.ParquetWriter(promoted_path, schema, compression="zstd")
+        try:
+            written = pq.ParquetFile(tmp_path)
+            for i in range(written.num_row_groups):
+                promoted.write_table(_conform(written.read_row_group(i), schema), row_group_size=ROW_GROUP_SIZE)
+        except BaseException:
+            promoted.close()
+            os.remove(promoted_path)
+            raise
+        os.remove(tmp_path)
+        return promoted, promoted_path
+
+    def write_session(self, session_key, data_queues):
+        # data_queues as returned by OpenF1Client.fetch_session: {"v1/laps": [...], ...}
+        return {topic: self.write(session_key, topic, records) for topic, records in data_queues.items()}
+
+    def read(self, session_key, endpoint, columns=None, drivers=None, laps=None):
+        path = self._path(session_key, endpoint)
+        schema = pq.read_schema(path)
+        filters = []
+        if drivers is not None and "driver_number" in schema.names:
+            filters.append(("driver_number", "in", [int(d) for d in drivers]))
+        if laps is not None and "lap_number" in schema.names:
+            lap_from, lap_to = laps
+            filters.append(("lap_number", ">=", lap_from))
+            filters.append(("lap_number", "<=", lap_to))
+        if columns is not None:
+            columns = [c for c in columns if c in schema.names]
+        table = pq.read_table(path, columns=columns, filters=filters or None, memory_map=True)
+        df = table.to_pandas(ignore_metadata=True)
+        if "driver_number" in df.columns:
+            df["driver_number"] = df["driver_number"].astype("category")
+        return df
+
+    def read_session(self, session_key, endpoints, columns=None, drivers=None, laps=None):
+        return {f"v1/{ep.split('/')[-1]}": self.read(session_key, ep, columns, drivers, laps) for ep in endpoints}
+
+    def columns(self, session_key, endpoint):
+        return pq.read_schema(self._path(session_key, endpoint)).names
@@ -0,0 +1,166 @@
+import numpy as np
+import pandas as pd
+from .live_state import LiveState, RECENT_TELEMETRY
+from .telemetry_index import _ns
+
+CHECKPOINT_INTERVAL = 30.0  # seconds of session time between LiveState checkpoints
+LATEST_WINDOW = 10.0        # seconds looked back for each car's latest car_data/location sample
+NS = 1_000_000_000
+
+# ~4 Hz per car: kept as date-sorted frames and sliced at seek time instead of replayed
+SAMPLED_TOPICS = ["v1/car_data", "v1/location"]
+
+
+def _payloads(df):
+    # Typed frame -> list of dicts with None (not NaN/NaT) for gaps, as LiveState handlers expect
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def _lap_starts(laps):
+    # (driver_number, lap_number) -> lap start (ns), and lap_number -> the leader's start of that lap
+    if laps is None or laps.empty or "date_start" not in laps.columns:
+        return pd.Series(dtype="int64"), pd.Series(dtype="int64")
+    starts = laps[["driver_number", "lap_number"]].assign(start=_ns(laps["date_start"]))
+    starts = starts[starts["start"] != np.iinfo(np.int64).min]
+    by_driver = starts.groupby(["driver_number", "lap_number"])["start"].min()
+    leader = starts.groupby("lap_number")["start"].min().sort_index()
+    return by_driver, leader
+
+
+def event_times(topic, df, by_driver, leader, default):
+    # When each row became known: its date, a lap's completion, or the start of a stint's first lap
+    invalid = np.iinfo(np.int64).min
+    if topic == "v1/laps" and "date_start" in df.columns:
+        start = pd.Series(_ns(df["date_start"]), index=df.index).where(lambda s: s != invalid)
+        duration = pd.to_numeric(df.get("lap_duration"), errors="coerce") if "lap_duration" in df.columns else np.nan
+        end = start + duration * NS
+        # Laps without a start time (often lap 1) end when the driver's next lap starts
+        next_start = start.groupby(df["driver_number"]).shift(-1) if "driver_number" in df.columns else start.shift(-1)
+        times = end.fillna(next_start).fillna(start)
+    elif "date" in df.columns:
+        times = pd.Series(_ns(df["date"]), index=df.index).where(lambda s: s != invalid)
+    else:
+        lap_column = next((c for c in ("lap_start", "lap_number") if c in df.columns), None)
+        if lap_column is None:
+            return np.full(len(df), default, dtype=np.int64)
+        keys = pd.MultiIndex.from_arrays([df["driver_number"], df[lap_column]]) if "driver_number" in df.columns else None
+        times = pd.Series(by_driver.reindex(keys).to_numpy() if keys is not None else np.nan, index=df.index, dtype="float64")
+        times = times.fillna(df[lap_column].map(leader))
+    return times.fillna(default).to_numpy(dtype=np.float64).astype(np.int64)
+
+
+class SessionTimeline:
+    # Time-indexed state of a finished session. Low-rate topics (laps, positions,
+    # intervals, stints, pits, weather, ...) are one date-sorted event array replayed
+    # through LiveState, with a copy of the state checkpointed every `interval` seconds.
+    # Seeking restores the nearest earlier checkpoint and replays at most `interval`
+    # seconds of events; car_data/location are sliced by binary search instead.
+    def __init__(self, start, end, checkpoint_times, checkpoints, event_times, event_topics, event_payloads, samples, lap_starts):
+        self.start = start                        # ns of the first event
+        self.end = end                            # ns of the last event
+        self.checkpoint_times = checkpoint_times  # int64 ns, ascending
+        self.checkpoints = checkpoints            # LiveState with every event at or before the matching time applied
+        self.event_times = event_times            # int64 ns, ascending
+        self.event_topics = event_topics          # topic per event
+        self.event_payloads = event_payloads      # payload dict per event
+        self.samples = samples                    # {topic: (int64 ns ascending, date-sorted frame)}
+        self.lap_starts = lap_starts              # leader's start (ns) of each lap, indexed by lap_number
+
+    @classmethod
+    def build(cls, data_queues, interval=CHECKPOINT_INTERVAL):
+        # data_queues: {topic: typed frame} as read back from the session store
+        frames = {topic: df for topic, df in data_queues.items() if isinstance(df, pd.DataFrame) and not df.empty}
+        by_driver, leader = _lap_starts(frames.get("v1/laps"))
+
+        samples = {}
+        for topic in SAMPLED_TOPICS:
+            df = frames.pop(topic, None)
+            if df is not None and "date" in df.columns:
+                df = df.sort_values("date", kind="stable", ignore_index=True)
+                samples[topic] = (_ns(df["date"]), df)
+
+        dated = [_ns(df["date"]) for df in frames.values() if "date" in df.columns]
+        dated += [times for times, _ in samples.values()]
+        known = np.concatenate([t[t != np.iinfo(np.int64).min] for t in dated]) if dated else np.array([], dtype=np.int64)
+        default = int(known.min()) if len(known) else int(leader.min()) if len(leader) else 0
+
+        handled = LiveState().handlers
+        times, topics, payloads = [], [], []
+        for topic, df in frames.items():
+            if topic not in handled:
+                continue
+            times.append(event_times(topic, df, by_driver, leader, default))
+            topics += [topic] * len(df)
+            payloads += _payloads(df)
+        times = np.concatenate(times) if times else np.array([], dtype=np.int64)
+        order = np.argsort(times, kind="stable")
+        times = times[order]
+        topics = [topics[i] for i in order]
+        payloads = [payloads[i] for i in order]
+
+        start = min(default, int(times[0])) if len(times) else default
+        end = max([start] + [int(t[-1]) for t in [times, *(t for t, _ in samples.values())] if len(t)])
+
+        # One pass over the events, copying the running state at each checkpoint boundary
+        checkpoint_times = np.arange(start, end + int(interval * NS), int(interval * NS), dtype=np.int64)
+        bounds = np.searchsorted(times, checkpoint_times, side="right")
+        state = LiveState()
+        checkpoints = []
+        applied = 0
+        for bound in bounds:
+            for i in range(applied, bound):
+                state.apply(topics[i], payloads[i])
+            applied = bound
+            checkpoints.append(state.copy())
+        return cls(start, end, checkpoint_times, checkpoints, times, topics, payloads, samples, leader)
+
+    @property
+    def duration(self):
+        return (self.end - self.start) / NS
+
+    def state_at(self, timestamp):
+        # LiveState as of `timestamp` (ns): nearest earlier checkpoint plus a short replay
+        timestamp = min(max(int(timestamp), self.start), self.end)
+        i = max(int(np.searchsorted(self.checkpoint_times, timestamp, side="right")) - 1, 0)
+        state = self.checkpoints[i].copy()
+        lo = np.searchsorted(self.event_times, self.checkpoint_times[i], side="right")
+        hi = np.searchsorted(self.event_times, timestamp, side="right")
+        for j in range(lo, hi):
+            state.apply(self.event_topics[j], self.event_payloads[j])
+        return state
+
+    def snapshot(self, timestamp):
+        # Same insight shapes as LiveState.snapshot(), with telemetry/locations/speeds sliced at `timestamp`
+        state = self.state_at(timestamp)
+        bounds = {topic: int(np.searchsorted(times, timestamp, side="right")) for topic, (times, _) in self.samples.items()}
+        state.topic_versions.update(bounds)  # samples "applied" so far, so unchanged positions keep their versions
+        insights = state.snapshot()
+        latest = {}
+        for topic, (times, df) in self.samples.items():
+            hi = bounds[topic]
+            lo = int(np.searchsorted(times, timestamp - int(LATEST_WINDOW * NS), side="left"))
+            latest[topic] = df.iloc[lo:hi].drop_duplicates("driver_number", keep="last")
+            if topic == "v1/car_data":
+                insights["telemetry"] = df.iloc[max(hi - RECENT_TELEMETRY, 0):hi].reset_index(drop=True)
+        if "v1/car_data" in latest and "speed" in latest["v1/car_data"].columns:
+            recent = latest["v1/car_data"]
+            insights["speeds"] = dict(zip(recent["driver_number"].astype(int), recent["speed"]))
+        if "v1/location" in latest:
+            recent = latest["v1/location"].dropna(subset=["x", "y"])
+            insights["locations"] = {int(num): (x, y) for num, x, y in zip(recent["driver_number"], recent["x"], recent["y"])}
+        return insights
+
+    def time_of_lap(self, lap_number):
+        # ns at which the leader started `lap_number`
+        if lap_number in self.lap_starts.index:
+            return int(self.lap_starts[lap_number])
+        return self.end if len(self.lap_starts) and lap_number > self.lap_starts.index.max() else self.start
+
+    def lap_at(self, timestamp):
+        # Leader's lap at `timestamp` (0 before the first lap starts)
+        i = int(np.searchsorted(self.lap_starts.to_numpy(), timestamp, side="right"))
+        return int(self.lap_starts.index[i - 1]) if i else 0
+
+    def nbytes(self):
+        return self.event_times.nbytes + self.checkpoint_times.nbytes + sum(
+            times.nbytes + int(df.memory_usage(deep=False).sum()) for times, df in self.samples.values())
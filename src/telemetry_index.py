@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+
+CHANNELS = ["speed", "rpm", "throttle", "brake", "n_gear", "drs"]
+DEFAULT_STEPS = {"distance": 10.0, "time": 0.25}  # metres / seconds between grid points
+MAX_LAP_SECONDS = 300  # bound for a driver's last lap when its duration is unknown
+SPAN_NS = 10 ** 14     # per-driver offset (~27 h) so (driver, time) sorts as one int64 key
+
+
+def _ns(series):
+    if pd.api.types.is_integer_dtype(series):
+        return series.to_numpy(dtype=np.int64)  # already epoch ns
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(series, utc=True, format="ISO8601")
+    return series.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+
+class TelemetryIndex:
+    # car_data bucketed into laps and resampled onto a fixed distance (or time) grid.
+    # Every lap is one row of a (laps x grid) array per channel, so fetching
+    # "driver X, lap N" is a dict lookup plus a row slice.
+    def __init__(self, mode, grid, channels, rows, lengths, lap_durations):
+        self.mode = mode
+        self.grid = grid                    # x values shared by every lap
+        self.channels = channels            # {channel: float32 array (n_laps, len(grid))}
+        self.rows = rows                    # {(driver_number, lap_number): row}
+        self.lengths = lengths              # valid grid points per row
+        self.lap_durations = lap_durations  # per row, NaN when unknown
+
+    @classmethod
+    def build(cls, car_data, laps, mode="distance", step=None):
+        step = step or DEFAULT_STEPS[mode]
+        car_data = car_data if isinstance(car_data, pd.DataFrame) else pd.DataFrame(car_data)
+        laps = laps if isinstance(laps, pd.DataFrame) else pd.DataFrame(laps)
+        laps = laps.dropna(subset=["date_start"])
+        channels = [c for c in CHANNELS if c in car_data.columns]
+        if car_data.empty or laps.empty:
+            return cls(mode, np.zeros(0), {c: np.zeros((0, 0), np.float32) for c in channels}, {}, np.zeros(0, int), np.zeros(0))
+
+        lap_driver = laps["driver_number"].to_numpy(dtype=np.int64)
+        cd_driver = car_data["driver_number"].to_numpy(dtype=np.int64)
+        lap_t, cd_t = _ns(laps["date_start"]), _ns(car_data["date"])
+        t0 = min(lap_t.min(), cd_t.min())
+        drivers = np.unique(lap_driver)
+
+        # Laps sorted by (driver, start); each lap ends at the driver's next lap start
+        lap_key = np.searchsorted(drivers, lap_driver) * SPAN_NS + (lap_t - t0)
+        lap_order = np.argsort(lap_key, kind="stable")
+        lap_key, lap_t, lap_driver = lap_key[lap_order], lap_t[lap_order], lap_driver[lap_order]
+        lap_number = laps["lap_number"].to_numpy(dtype=np.int64)[lap_order]
+        durations = laps["lap_duration"].to_numpy(dtype=float)[lap_order] if "lap_duration" in laps.columns else np.full(len(laps), np.nan)
+        fallback_end = lap_t + np.where(np.isnan(durations), MAX_LAP_SECONDS, durations) * 1e9
+        same_next = np.append(lap_driver[1:] == lap_driver[:-1], False)
+        lap_end = np.where(same_next, np.append(lap_t[1:], 0), fallback_end.astype(np.int64))
+
+        # Bucket every sample into its lap with one searchsorted over the combined key
+        d_idx = np.searchsorted(drivers, cd_driver)
+        known = (d_idx < len(drivers)) & (drivers[np.minimum(d_idx, len(drivers) - 1)] == cd_driver)
+        cd_key = np.where(known, d_idx, 0) * SPAN_NS + (cd_t - t0)
+        order = np.argsort(cd_key, kind="stable")
+        order = order[known[order]]
+        cd_key, t = cd_key[order], cd_t[order]
+        pos = np.searchsorted(lap_key, cd_key, side="right") - 1
+        inside = (pos >= 0)
+        safe = np.maximum(pos, 0)
+        inside &= (lap_driver[safe] == cd_driver[order]) & (t < lap_end[safe])
+        order, t, pos = order[inside], t[inside], pos[inside]
+        if len(order) == 0:
+            return cls(mode, np.zeros(0), {c: np.zeros((0, 0), np.float32) for c in channels}, {}, np.zeros(0, int), np.zeros(0))
+
+        rows_used, seg = np.unique(pos, return_inverse=True)
+        seg_start = np.searchsorted(seg, np.arange(len(rows_used)))
+        seg_end = np.append(seg_start[1:], len(seg))
+        elapsed = (t - lap_t[pos]) / 1e9
+
+        values = {c: car_data[c].to_numpy(dtype=float)[order] for c in channels}
+        if mode == "distance":
+            # Trapezoidal integration of speed (km/h), restarted at every lap boundary
+            v = values.get("speed", np.zeros(len(t))) / 3.6
+            dt = np.diff(elapsed, prepend=0.0)
+            ds = np.where(np.arange(len(t)) == seg_start[seg], v * elapsed, (v + np.roll(v, 1)) / 2 * dt)
+            cs = np.cumsum(ds)
+            x = cs - (cs[seg_start] - ds[seg_start])[seg]
+            values["time"] = elapsed
+        else:
+            x = elapsed
+
+        # Resample all laps at once: composite x key per segment, one searchsorted for every grid point
+        grid = np.arange(0.0, x.max() + step, step)
+        stride = grid[-1] + 2 * step
+        xs = seg * stride + x
+        query = (np.arange(len(rows_used))[:, None] * stride + grid[None, :]).ravel()
+        q_seg = np.repeat(np.arange(len(rows_used)), len(grid))
+        j = np.clip(np.searchsorted(xs, query, side="right") - 1, seg_start[q_seg], seg_end[q_seg] - 1)
+        j1 = np.minimum(j + 1, seg_end[q_seg] - 1)
+        span = xs[j1] - xs[j]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            w = np.where(span > 0, np.clip((query - xs[j]) / span, 0.0, 1.0), 0.0)
+        lengths = np.searchsorted(grid, x[seg_end - 1], side="right")
+        beyond = np.tile(np.arange(len(grid)), len(rows_used)) >= np.repeat(lengths, len(grid))
+
+        resampled = {}
+        for name, v in values.items():
+            out = v[j] + w * (v[j1] - v[j])
+            out[beyond] = np.nan
+            resampled[name] = out.reshape(len(rows_used), len(grid)).astype(np.float32)
+
+        rows = {(int(d), int(n)): i for i, (d, n) in enumerate(zip(lap_driver[rows_used], lap_number[rows_used]))}
+        return cls(mode, grid, resampled, rows, lengths, durations[rows_used])
+
+    def has(self, driver_number, lap_number):
+        return (int(driver_number), int(lap_number)) in self.rows
+
+    def laps_for(self, driver_number):
+        return sorted(lap for driver, lap in self.rows if driver == int(driver_number))
+
+    def lap_numbers(self):
+        return sorted({lap for _, lap in self.rows})
+
+    def best_lap(self, driver_number):
+        candidates = [(self.lap_durations[row], lap) for (driver, lap), row in self.rows.items()
+                      if driver == int(driver_number) and not np.isnan(self.lap_durations[row])]
+        return min(candidates)[1] if candidates else None
+
+    def lap(self, driver_number, lap_number):
+        # Compact views (no copies) of one lap's resampled channels, or None
+        row = self.rows.get((int(driver_number), int(lap_number)))
+        if row is None:
+            return None
+        n = self.lengths[row]
+        data = {self.mode: self.grid[:n]}
+        for name, array in self.channels.items():
+            data[name] = array[row, :n]
+        return data
+
+    def compare(self, driver_a, lap_a, driver_b, lap_b):
+        # Two laps on the shared grid; in distance mode adds the running time delta (b - a)
+        a, b = self.lap(driver_a, lap_a), self.lap(driver_b, lap_b)
+        if a is None or b is None:
+            return a, b, None
+        n = min(len(a[self.mode]), len(b[self.mode]))
+        delta = b["time"][:n] - a["time"][:n] if "time" in a else None
+        return a, b, delta
+
+    def nbytes(self):
+        return sum(array.nbytes for array in self.channels.values())
@@ -0,0 +1,90 @@
+import threading
+from collections import deque
+
+# Per-topic history kept in live mode (messages, not seconds). car_data/location
+# arrive at ~4 Hz per car, so 48000 is roughly 10 minutes of a 20-car field.
+TOPIC_CAPACITIES = {
+    "v1/car_data": 48000,
+    "v1/location": 48000,
+    "v1/position": 5000,
+    "v1/intervals": 20000,
+    "v1/laps": 3000,
+    "v1/stints": 500,
+    "v1/pit": 500,
+    "v1/race_control": 1000,
+    "v1/weather": 500,
+    "v1/tyres": 500,
+    "v1/team_radio": 500,
+}
+DEFAULT_CAPACITY = 500
+
+
+class TopicBuffer:
+    # Bounded FIFO: append is O(1) and drops the oldest message once full
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.items = deque(maxlen=capacity)
+        self.total = 0  # messages ever appended (including dropped ones)
+
+    def append(self, item):
+        with self.lock:
+            self.items.append(item)
+            self.total += 1
+
+    def snapshot(self):
+        # Consistent copy for readers on other threads
+        with self.lock:
+            return list(self.items)
+
+    def latest(self, n=1):
+        with self.lock:
+            count = min(n, len(self.items))
+            return [self.items[i] for i in range(len(self.items) - count, len(self.items))]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class TopicStore:
+    # {topic: TopicBuffer}, written by the MQTT thread and read by the UI/engine
+    def __init__(self, capacities=None):
+        self.capacities = {**TOPIC_CAPACITIES, **(capacities or {})}
+        self.lock = threading.Lock()
+        self.buffers = {}
+
+    def add(self, topic):
+        with self.lock:
+            if topic not in self.buffers:
+                self.buffers[topic] = TopicBuffer(self.capacities.get(topic, DEFAULT_CAPACITY))
+            return self.buffers[topic]
+
+    def append(self, topic, item):
+        buffer = self.buffers.get(topic)
+        if buffer is not None:
+            buffer.append(item)
+
+    def snapshot(self, topics=None):
+        # {topic: [messages]} in the shape generate_insights expects
+        with self.lock:
+            buffers = dict(self.buffers)
+        return {topic: buffer.snapshot() for topic, buffer in buffers.items() if topics is None or topic in topics}
+
+    def get(self, topic, default=None):
+        return self.buffers.get(topic, default)
+
+    def __contains__(self, topic):
+        return topic in self.buffers
+
+    def __getitem__(self, topic):
+        return self.buffers[topic]
+
+    def __iter__(self):
+        return iter(list(self.buffers))
+
+    def items(self):
+        return list(self.buffers.items())
@@ -0,0 +1,149 @@
+import json
+import numpy as np
+import pandas as pd
+
+MINI_SECTORS = 25
+LOCATION_UNIT_M = 0.1   # OpenF1 location x/y are roughly decimetres
+REFERENCE_SPACING = 20  # location units between centreline points (~2 m)
+DELTA_MIN_M = 5.0       # cars that moved less than this along the track are not re-sent
+
+
+class TrackModel:
+    # Circuit centreline in OpenF1 location (x, y) space, with precomputed segment
+    # starts, directions, lengths and cumulative distance for vectorized projection.
+    def __init__(self, points, unit_m=LOCATION_UNIT_M):
+        points = np.asarray(points, dtype=float)
+        if not np.allclose(points[0], points[-1]):
+            points = np.vstack([points, points[:1]])  # closed loop
+        self.points = points
+        self.starts = points[:-1]
+        self.dirs = points[1:] - points[:-1]
+        self.seg_len2 = np.maximum((self.dirs ** 2).sum(axis=1), 1e-9)
+        self.seg_len = np.sqrt(self.seg_len2)
+        self.cum = np.concatenate(([0.0], np.cumsum(self.seg_len)))
+        self.unit_m = unit_m
+        self.length = self.cum[-1]  # in location units
+
+    @classmethod
+    def from_location(cls, records, unit_m=LOCATION_UNIT_M, lap_length_m=None):
+        # One lap of one car's location samples -> centreline. With a known lap length
+        # (e.g. from the circuit store) the unit scale is calibrated instead of assumed.
+        df = records if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+        df = df.sort_values("date") if "date" in df.columns else df
+        xy = df[["x", "y"]].to_numpy(dtype=float)
+        travelled = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(xy, axis=0).T))))
+        bins = travelled // REFERENCE_SPACING
+        keep = np.concatenate(([True], bins[1:] != bins[:-1]))  # ~one point per REFERENCE_SPACING
+        model = cls(xy[keep], unit_m)
+        if lap_length_m:
+            model.unit_m = lap_length_m / model.length
+        return model
+
+    @classmethod
+    def fetch(cls, client, session_key, driver_number=None, lap_number=2, lap_length_m=None):
+        # Reference lap from the REST API: a clean early lap of one driver
+        params = {"session_key": session_key, "lap_number": lap_number}
+        if driver_number is not None:
+            params["driver_number"] = driver_number
+        laps = [lap for lap in client.fetch_historical("laps", params) if lap.get("date_start") and lap.get("lap_duration")]
+        if not laps:
+            return None
+        lap = laps[0]
+        start = pd.Timestamp(lap["date_start"])
+        end = start + pd.Timedelta(seconds=lap["lap_duration"])
+        records = client.fetch_historical("location", {
+            "session_key": session_key, "driver_number": lap["driver_number"],
+            "date>=": start.isoformat(), "date<": end.isoformat(),
+        })
+        if len(records) < 10:
+            return None
+        return cls.from_location(records, lap_length_m=lap_length_m)
+
+    def project(self, xy):
+        # (K, 2) points -> distance along the lap (location units) and offset from the line
+        xy = np.atleast_2d(np.asarray(xy, dtype=float))
+        rel = xy[:, None, :] - self.starts[None, :, :]                   # K x M x 2
+        t = np.clip((rel * self.dirs[None]).sum(axis=2) / self.seg_len2, 0.0, 1.0)
+        nearest = self.starts[None] + t[..., None] * self.dirs[None]
+        dist2 = ((xy[:, None, :] - nearest) ** 2).sum(axis=2)
+        seg = np.argmin(dist2, axis=1)
+        rows = np.arange(len(xy))
+        s = self.cum[seg] + t[rows, seg] * self.seg_len[seg]
+        return s, np.sqrt(dist2[rows, seg])
+
+    def svg_html(self):
+        # Static centreline page; cars are moved by pushing updateCars({...}) deltas
+        (x0, y0), (x1, y1) = self.points.min(axis=0), self.points.max(axis=0)
+        pad = 0.05 * max(x1 - x0, y1 - y0)
+        path = " ".join(f"{x:.0f},{-y:.0f}" for x, y in self.points)
+        return f"""<html><body style="margin:0"><svg id="track" viewBox="{x0 - pad:.0f} {-y1 - pad:.0f} {x1 - x0 + 2 * pad:.0f} {y1 - y0 + 2 * pad:.0f}" width="100%" height="100%">
+<polyline points="{path}" fill="none" stroke="#888" stroke-width="{pad / 8:.0f}"/><g id="cars"></g></svg>
+<script>
+var r = {pad / 5:.0f};
+function updateCars(d) {{
+  var g = document.getElementById("cars");
+  for (var num in d) {{
+    var c = document.getElementById("car-" + num);
+    if (!c) {{
+      c = document.createElementNS("http://www.w3.org/2000/svg", "g"); c.id = "car-" + num;
+      c.innerHTML = '<circle r="' + r + '" fill="#e10600"/><text font-size="' + 2 * r + '" x="' + 1.2 * r + '">' + num + '</text>';
+      g.appendChild(c);
+    }}
+    c.setAttribute("transform", "translate(" + d[num][0] + "," + (-d[num][1]) + ")");
+  }}
+}}
+</script></body></html>"""
+
+
+class PositionTracker:
+    # Per-tick track distance, mini-sector and on-track gap for every car at once
+    def __init__(self, model, mini_sectors=MINI_SECTORS):
+        self.model = model
+        self.mini_sectors = mini_sectors
+        self.sent = {}  # {driver_number: track distance last pushed to the map}
+
+    def update(self, locations, speeds=None):
+        # locations: {driver_number: (x, y)}; speeds: {driver_number: km/h}
+        if not locations:
+            return pd.DataFrame(columns=["driver_number", "x", "y", "distance_m", "mini_sector", "car_ahead", "gap_ahead_m", "gap_ahead_s"])
+        drivers = np.array(list(locations))
+        xy = np.array([locations[d] for d in drivers], dtype=float)
+        s, _ = self.model.project(xy)
+        length = self.model.length
+        mini = np.minimum((s / length * self.mini_sectors).astype(int), self.mini_sectors - 1)
+
+        # Car physically ahead on track (wrapping over the line), regardless of race position
+        order = np.argsort(s)
+        ahead = np.roll(order, -1)
+        gap_units = np.empty(len(s))
+        gap_units[order] = (s[ahead] - s[order]) % length
+        car_ahead = np.empty(len(s), dtype=drivers.dtype)
+        car_ahead[order] = drivers[ahead]
+        gap_m = gap_units * self.model.unit_m
+        speed = np.array([(speeds or {}).get(d, np.nan) for d in drivers], dtype=float) / 3.6
+        with np.errstate(invalid="ignore", divide="ignore"):
+            gap_s = np.where(speed > 1, gap_m / speed, np.nan)
+        if len(s) == 1:
+            car_ahead[:] = drivers
+            gap_m[:] = gap_s[:] = np.nan
+
+        return pd.DataFrame({
+            "driver_number": drivers, "x": xy[:, 0], "y": xy[:, 1],
+            "distance_m": s * self.model.unit_m, "mini_sector": mini + 1,
+            "car_ahead": car_ahead, "gap_ahead_m": gap_m, "gap_ahead_s": gap_s,
+        })
+
+    def delta(self, positions):
+        # {driver_number: [x, y, mini_sector]} for cars that moved since the last push
+        changes = {}
+        lap_m = self.model.length * self.model.unit_m
+        for num, x, y, dist, mini in zip(positions["driver_number"], positions["x"], positions["y"], positions["distance_m"], positions["mini_sector"]):
+            last = self.sent.get(num)
+            if last is None or min(abs(dist - last), lap_m - abs(dist - last)) >= DELTA_MIN_M:
+                self.sent[num] = dist
+                changes[str(num)] = [round(float(x)), round(float(y)), int(mini)]
+        return changes
+
+    def delta_script(self, positions):
+        changes = self.delta(positions)
+        return f"updateCars({json.dumps(changes)})" if changes else None